@@ -1,8 +1,10 @@
-import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
-import subprocess
-import re
+from media_probe import get_duration
+from split_engine import ASPECT_NAMES, crop_filter_for, expand_profiles, make_profile, plan_parts
+from split_preview import format_time, preview_source
+from split_progress import start_split
+from titles import title_image
 
 def split_video():
     file_path = filedialog.askopenfilename(
@@ -18,76 +20,59 @@ def split_video():
             return
 
         title_base = simpledialog.askstring("Video Title", "Enter the title for the video:") or "Video"
-        aspect_ratio = simpledialog.askstring("Aspect Ratio", "Enter aspect ratio (9:16 for Portrait, 16:9 for Landscape):")
-        if aspect_ratio not in ["9:16", "16:9"]:
-            messagebox.showerror("Invalid Input", "Invalid aspect ratio. Please enter 9:16 or 16:9.")
+        aspect_ratio = simpledialog.askstring("Aspect Ratio", "Enter aspect ratio (9:16 for Portrait, 16:9 for Landscape, 9:16,16:9 for both):")
+        # Several ratios are all rendered from the same decode of the video
+        aspect_ratios = list(dict.fromkeys(a.strip() for a in (aspect_ratio or "").split(",")))
+        if any(a not in ["9:16", "16:9"] for a in aspect_ratios):
+            messagebox.showerror("Invalid Input", "Invalid aspect ratio. Please enter 9:16, 16:9 or 9:16,16:9.")
             return
 
+        # this is for center
+        # crop_offset = 0
+
+        # this is for towards right
+        crop_offset = 200
+
+        # Optional: check the crop window and find cut points on a small proxy
+        marks = {"cut_start": None, "cut_end": None}
+        if messagebox.askyesno("Preview", "Do you want to preview the crop and find the cut points first?"):
+            preview = preview_source(root, file_path, "9:16" if "9:16" in aspect_ratios else "16:9", crop_offset)
+            if preview:
+                crop_offset = preview["crop_offset"]
+                marks = preview
+
         cut_out = messagebox.askyesno("Cut Out Section", "Do you want to cut out some seconds or minutes from your video?")
         cut_start, cut_end = None, None
         if cut_out:
-            cut_start_str = simpledialog.askstring("Cut Start", "Enter start time of the part to cut (HH:MM:SS):", initialvalue="00:00:00")
+            cut_start_str = simpledialog.askstring("Cut Start", "Enter start time of the part to cut (HH:MM:SS):", initialvalue=format_time(marks["cut_start"] or 0))
             cut_start = convert_to_seconds(cut_start_str)
-            cut_end_str = simpledialog.askstring("Cut End", "Enter end time of the part to cut (HH:MM:SS):", initialvalue="00:00:04")
+            cut_end_str = simpledialog.askstring("Cut End", "Enter end time of the part to cut (HH:MM:SS):", initialvalue=format_time(marks["cut_end"] or 4))
             cut_end = convert_to_seconds(cut_end_str)
 
         duration = get_video_duration(file_path)
-        output_dir = os.path.dirname(file_path)
-        base_filename = os.path.splitext(os.path.basename(file_path))[0]
-        num_segments = int(duration // segment_length) + (1 if duration % segment_length > 0 else 0)
-
-        for i in range(num_segments):
-            start_time = i * segment_length
-            end_time = min(start_time + segment_length, duration)  # Ensure we don't exceed the video length
-
-            # If the segment overlaps with the cut section, adjust start and end
-            if cut_start is not None and cut_end is not None:
-                if cut_start <= start_time < cut_end:
-                    start_time = cut_end
-                if cut_start < end_time <= cut_end:
-                    end_time = cut_start
-
-            # Ensure we're not processing an empty segment
-            if end_time - start_time <= 0:
-                continue
-
-            part_label = f"Part {number_to_words(i+1)}"
-            title_text = f"{title_base} - {part_label}"
-            output_path = os.path.join(output_dir, f"{base_filename}_{part_label.replace(' ', '_')}.mp4")
-
-            title_filter = create_title_filter(title_text, aspect_ratio)
-
-            # this is for center
-            # crop_filter = "crop=ih*9/16:ih:(iw-ih*9/16)/2:0" if aspect_ratio == "9:16" else ""
-
-            # this is for towards right
-            crop_filter = "crop=ih*9/16:ih:((iw-ih*9/16)/2 + 200):0" if aspect_ratio == "9:16" else ""
-
-            full_filter = f"{crop_filter},{title_filter}" if crop_filter else title_filter
-
-            cmd = [
-                'ffmpeg', '-i', file_path,
-                '-vf', full_filter,
-                '-ss', str(start_time), '-to', str(end_time),
-                '-c:v', 'libx264', '-c:a', 'aac', '-strict', 'experimental',
-                output_path
-            ]
+        parts = plan_parts(file_path, duration, segment_length, title_base, cut_start, cut_end,
+                           part_name=number_to_words)
 
-            print("Running command:", " ".join(cmd))
-            subprocess.run(cmd)
+        profiles = [make_profile(lambda title_text, a=a: create_title_filter(title_text, a),
+                                 crop_filter_for(a, crop_offset), name=ASPECT_NAMES[a])
+                    for a in aspect_ratios]
 
+        def on_done(succeeded, failed):
+            if failed:
+                messagebox.showwarning("Partly Done", f"{len(succeeded)} part(s) were written, {len(failed)} failed.\n"
+                                       "See the terminal output for the failed parts.")
+                return
+            messagebox.showinfo("Success", "Yay! Your video is ready, sweetheart! Now go show it off to the world...or at least to your cat!")
 
-        messagebox.showinfo("Success", "Yay! Your video is ready, sweetheart! Now go show it off to the world...or at least to your cat!")
+        # Encoding runs in the background so the window stays responsive
+        start_split(root, file_path, expand_profiles(parts, profiles), profiles, on_done)
 
     except Exception as e:
         messagebox.showerror("Error", f"Failed to split video:\n{str(e)}")
 
 
 def get_video_duration(file_path):
-    result = subprocess.run(['ffmpeg', '-i', file_path], stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-    output = result.stderr.decode()
-    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+\.\d+)", output)
-    return sum(float(x) * 60 ** i for i, x in enumerate(reversed(match.groups()))) if match else 0
+    return get_duration(file_path)
 
 
 def number_to_words(n):
@@ -110,17 +95,11 @@ def create_title_filter(title_text, aspect_ratio):
     font_path = "/home/isc-kfc/share/fonts/Sigmar/Sigmar-Regular.ttf"
 
     if aspect_ratio == "9:16":
-        return (
-            "drawbox=x=0:y=80:w=iw:h=120:color=black@0.5:t=fill,"  # Transparent background, moved slightly lower
-            f"drawtext=fontfile={font_path}:text='{title_text}':"
-            "x=(w-text_w)/2:y=120:fontcolor=white:fontsize=20"
-        )
+        # Transparent background, moved slightly lower
+        return title_image(title_text, font_path, box_y=80, box_height=120, text_y=120, fontsize=20)
     else:
-        return (
-            "drawbox=x=0:y=20:w=iw:h=100:color=black@0.5:t=fill,"  # Transparent background
-            f"drawtext=fontfile={font_path}:text='{title_text}':"
-            "x=(w-text_w)/2:y=50:fontcolor=white:fontsize=30"
-        )
+        # Transparent background
+        return title_image(title_text, font_path, box_y=20, box_height=100, text_y=50, fontsize=30)
 
 
 root = tk.Tk()
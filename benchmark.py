@@ -0,0 +1,197 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from media_probe import get_duration
+from split_engine import COPY_MODES, build_split_tasks, default_jobs, make_profile, plan_parts, run_tasks
+
+BENCH_CROP = "crop=ih*9/16:ih:(iw-ih*9/16)/2:0"
+BENCH_TITLE = "drawbox=x=0:y=80:w=iw:h=120:color=black@0.5:t=fill"
+
+# Benchmark name -> (split mode, parts encoded at once; None for default_jobs)
+#   current    - the original command: one ffmpeg per part, output seeking
+#   input-seek - one ffmpeg per part, input seeking
+#   parallel   - input seeking with several parts encoded at once
+#   single     - one decode writes every part
+#   copy, smartcut - no video re-encode, no crop or title
+BENCH_MODES = {
+    "current": ("output", 1),
+    "input-seek": ("input", 1),
+    "parallel": ("input", None),
+    "single": ("single", 1),
+    "copy": ("copy", 1),
+    "smartcut": ("smartcut", 1),
+}
+METRICS = ("wall", "cpu", "peak_rss", "output_bytes")
+
+
+def make_source(path, duration, size="1280x720", rate=30):
+    # Synthetic footage so the benchmark needs no real video
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f"testsrc2=size={size}:rate={rate}:duration={duration}",
+        '-f', 'lavfi', '-i', f"sine=frequency=440:duration={duration}",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-g', str(rate * 2),
+        '-c:a', 'aac', '-shortest', path
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(['ffmpeg', '-version'], stdout=subprocess.PIPE, check=True)
+        return result.stdout.decode().splitlines()[0]
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(source, duration, segment_length, mode, work_dir):
+    # Runs in a fresh worker process, so RUSAGE_CHILDREN only counts the
+    # ffmpeg processes of this case
+    split_mode, jobs = BENCH_MODES[mode]
+    jobs = max(2, default_jobs()) if jobs is None else jobs
+    os.makedirs(work_dir)
+    parts = plan_parts(source, duration, segment_length, "Bench", output_dir=work_dir)
+    # The copy modes cannot crop, so they are timed on the plain split
+    crop = "" if split_mode in COPY_MODES else BENCH_CROP
+    tasks = build_split_tasks(source, parts, [make_profile(lambda title: BENCH_TITLE, crop)], split_mode,
+                              jobs=jobs)
+    for task in tasks:
+        task["cmds"] = [cmd[:1] + ['-y', '-loglevel', 'error'] + cmd[1:] for cmd in task["cmds"]]
+
+    finished = []
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        _, failed = run_tasks(tasks, jobs, on_result=lambda part, ok: finished.append(time.perf_counter()))
+    wall = time.perf_counter() - started
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    result = {
+        "wall": wall,
+        "cpu": usage.ru_utime + usage.ru_stime,
+        # Largest single ffmpeg process; ru_maxrss is KB on Linux, bytes on macOS
+        "peak_rss": usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+        "output_bytes": sum(os.path.getsize(part["output_path"]) for part in parts
+                            if os.path.exists(part["output_path"])),
+        "jobs": jobs,
+        "parts": len(parts),
+        "failed": len(failed),
+    }
+    if split_mode != "single" and jobs == 1:
+        # One part after another, so the gaps are the time of each part
+        result["part_seconds"] = [b - a for a, b in zip([started] + finished, finished)]
+    return result
+
+
+def measure(source, duration, segment_length, mode, work_dir, repeat):
+    # Best of repeat runs, each in its own process
+    runs = []
+    for n in range(repeat):
+        case_dir = os.path.join(work_dir, f"{mode}_{n}")
+        with multiprocessing.Pool(1) as pool:
+            runs.append(pool.apply(run_case, (source, duration, segment_length, mode, case_dir)))
+        shutil.rmtree(case_dir)
+    return min(runs, key=lambda run: run["wall"])
+
+
+def run_suite(args):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        sources = []
+        for length in args.lengths:
+            for size in args.sizes:
+                path = os.path.join(work_dir, f"{length}s_{size}.mp4")
+                make_source(path, length, size)
+                sources.append((f"{length}s_{size}", path, length))
+        for path in args.source or []:
+            sources.append((os.path.basename(path), os.path.abspath(path), get_duration(path)))
+
+        for name, path, length in sources:
+            for mode in args.modes:
+                result = measure(path, length, args.segment, mode, os.path.join(work_dir, name), args.repeat)
+                result.update(source=name, mode=mode)
+                results.append(result)
+                line = (f"{name:>16} {mode:>10}: {result['wall']:7.2f}s wall  {result['cpu']:7.2f}s cpu  "
+                        f"{result['peak_rss'] / 2 ** 20:6.0f} MB rss  {result['output_bytes'] / 2 ** 20:7.1f} MB out")
+                if "part_seconds" in result:
+                    # last/first close to 1.0 means the cost of a part does not grow with its index
+                    seconds = result["part_seconds"]
+                    line += f"  last/first {seconds[-1] / seconds[0]:.2f}"
+                if result["failed"]:
+                    line += f"  {result['failed']} FAILED"
+                print(line)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg_version(),
+        "segment": args.segment,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 1 if any(result["failed"] for result in results) else 0
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = {(r["source"], r["mode"]): r for r in json.load(f)["results"]}
+    with open(args.results) as f:
+        results = json.load(f)["results"]
+
+    regressions = 0
+    for result in results:
+        old = baseline.get((result["source"], result["mode"]))
+        if old is None:
+            print(f"{result['source']:>16} {result['mode']:>10}: not in the baseline")
+            continue
+        changes = []
+        for metric in METRICS:
+            if not old[metric]:
+                continue
+            ratio = result[metric] / old[metric]
+            flag = ""
+            if ratio > 1 + args.threshold:
+                flag = " REGRESSION"
+                regressions += 1
+            changes.append(f"{metric} {ratio - 1:+.0%}{flag}")
+        print(f"{result['source']:>16} {result['mode']:>10}: " + "  ".join(changes))
+    print(f"{regressions} regression(s) over {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the split modes on generated test sources")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time every mode on every source and save the results")
+    run.add_argument("--lengths", nargs="+", type=int, default=[60, 300], help="source lengths in seconds")
+    run.add_argument("--sizes", nargs="+", default=["640x360", "1280x720"], help="source resolutions")
+    run.add_argument("--source", nargs="+", help="real videos to time as well")
+    run.add_argument("--segment", type=int, default=30, help="segment length in seconds")
+    run.add_argument("--modes", nargs="+", default=list(BENCH_MODES), choices=BENCH_MODES)
+    run.add_argument("--repeat", type=int, default=1, help="runs per case; the fastest is kept")
+    run.add_argument("--output", default="benchmark.json", help="results file")
+
+    check = commands.add_parser("compare", help="flag regressions against a saved baseline")
+    check.add_argument("baseline", help="results file of the baseline run")
+    check.add_argument("results", help="results file to check")
+    check.add_argument("--threshold", type=float, default=0.10,
+                       help="relative increase that counts as a regression (default 0.10)")
+
+    args = parser.parse_args()
+    return run_suite(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# Pieces shorter than this (well under a frame) are rounding left over from
+# mapping edited times back to the source, not content
+MIN_PIECE = 0.001
+
+
+def parse_time(value):
+    # HH:MM:SS like the GUI prompts, MM:SS, or plain seconds
+    seconds = 0.0
+    for field in str(value).split(":"):
+        seconds = seconds * 60 + float(field)
+    return seconds
+
+
+def load_edl(path):
+    # One removed range per line, "START END" or "START,END", with times as
+    # HH:MM:SS or seconds. Blank lines and anything after a # are ignored.
+    ranges = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split("#", 1)[0].replace(",", " ").split()
+            if not fields:
+                continue
+            try:
+                if len(fields) != 2:
+                    raise ValueError("expected START END")
+                ranges.append((parse_time(fields[0]), parse_time(fields[1])))
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: {e}") from None
+    return ranges
+
+
+def merge_ranges(removed, duration):
+    # Sorted, clipped to the source and with overlapping ranges joined
+    merged = []
+    for start, end in sorted(removed):
+        if end <= start:
+            raise ValueError(f"Cut end ({end}) must be after cut start ({start})")
+        start, end = max(0.0, start), min(duration, end)
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def kept_ranges(duration, removed):
+    # The source ranges left once every removed range is taken out
+    kept, position = [], 0.0
+    for start, end in merge_ranges(removed, duration):
+        if start > position:
+            kept.append((position, start))
+        position = end
+    if position < duration:
+        kept.append((position, duration))
+    return kept
+
+
+def edited_duration(kept):
+    return sum(end - start for start, end in kept)
+
+
+def source_pieces(kept, start, end):
+    # The source ranges that make up start..end of the edited timeline
+    pieces, position = [], 0.0
+    for source_start, source_end in kept:
+        length = source_end - source_start
+        low, high = max(start, position), min(end, position + length)
+        if high - low >= MIN_PIECE:
+            pieces.append((source_start + low - position, source_start + high - position))
+        position += length
+    return pieces
@@ -0,0 +1,35 @@
+import bisect
+
+import run_log
+from source_index import load_index
+
+
+def read_keyframes(file_path):
+    # Packet flags only: ffprobe demuxes the video stream without decoding it
+    result = run_log.run(
+        "keyframes", ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                      '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', file_path],
+        check=True, source=file_path
+    )
+    keyframes = []
+    for line in result.stdout.decode().splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            keyframes.append(float(pts_time))
+    return sorted(set(keyframes))
+
+
+def load_keyframes(file_path):
+    return load_index(file_path, "keyframes", read_keyframes)
+
+
+def nearest_keyframe(keyframes, t):
+    i = bisect.bisect_left(keyframes, t)
+    candidates = keyframes[max(0, i - 1):i + 1]
+    return min(candidates, key=lambda k: abs(k - t)) if candidates else t
+
+
+def next_keyframe(keyframes, t):
+    # A keyframe within a millisecond of t counts as being at t
+    i = bisect.bisect_left(keyframes, t - 0.001)
+    return keyframes[i] if i < len(keyframes) else None
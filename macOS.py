@@ -2,8 +2,10 @@ import os
 os.environ['TK_SILENCE_DEPRECATION'] = '1'
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
-import subprocess
-import re
+from media_probe import get_duration
+from split_engine import ASPECT_NAMES, expand_profiles, make_profile, plan_parts
+from split_progress import start_split
+from titles import title_image
 
 # Set up the main window
 root = tk.Tk()
@@ -39,10 +41,12 @@ def split_video():
                                         parent=root) or "My Video"
 
     aspect_ratio = simpledialog.askstring("Aspect Ratio",
-                                          "Enter aspect ratio (9:16 or 16:9):",
+                                          "Enter aspect ratio (9:16, 16:9, or 9:16,16:9 for both):",
                                           parent=root)
-    if aspect_ratio not in ["9:16", "16:9"]:
-        messagebox.showerror("Invalid Input", "Invalid aspect ratio. Please enter 9:16 or 16:9.")
+    # Several ratios are all rendered from the same decode of the video
+    aspect_ratios = list(dict.fromkeys(a.strip() for a in (aspect_ratio or "").split(",")))
+    if any(a not in ["9:16", "16:9"] for a in aspect_ratios):
+        messagebox.showerror("Invalid Input", "Invalid aspect ratio. Please enter 9:16, 16:9 or 9:16,16:9.")
         return
 
     # Get the duration of the video
@@ -51,35 +55,23 @@ def split_video():
         messagebox.showerror("Error", "Could not determine video duration.")
         return
 
-    output_dir = os.path.dirname(file_path)
-    base_filename = os.path.splitext(os.path.basename(file_path))[0]
-    num_segments = int(duration // segment_length) + (1 if duration % segment_length > 0 else 0)
-
-    for i in range(num_segments):
-        start_time = i * segment_length
-        part_label = f"Part {number_to_words(i+1)}"
-        full_title = f"{title_base} - {part_label}"
-        output_path = os.path.join(output_dir, f"{base_filename}_{part_label.replace(' ', '_')}.mp4")
-        title_filter = create_title_filter(full_title, aspect_ratio)
-
-        cmd = [
-            'ffmpeg', '-i', file_path,
-            '-vf', title_filter,
-            '-ss', str(start_time), '-t', str(segment_length),
-            '-c:v', 'libx264', '-c:a', 'aac', '-strict', 'experimental',
-            output_path
-        ]
-        print("Running command:", " ".join(cmd))
-        subprocess.run(cmd)
-
-    messagebox.showinfo("Success", "Video has been successfully split!")
+    parts = plan_parts(file_path, duration, segment_length, title_base, part_name=number_to_words)
+    # The title layout follows the ratio; the frame itself is not cropped here
+    profiles = [make_profile(lambda full_title, a=a: create_title_filter(full_title, a), name=ASPECT_NAMES[a])
+                for a in aspect_ratios]
+
+    def on_done(succeeded, failed):
+        if failed:
+            messagebox.showwarning("Partly Done", f"{len(succeeded)} part(s) were written, {len(failed)} failed.\n"
+                                   "See the terminal output for the failed parts.")
+            return
+        messagebox.showinfo("Success", "Video has been successfully split!")
+
+    # Encoding runs in the background so the window stays responsive
+    start_split(root, file_path, expand_profiles(parts, profiles), profiles, on_done)
 
 def get_video_duration(file_path):
-    result = subprocess.run(['ffmpeg', '-i', file_path],
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    output = result.stderr.decode()
-    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+\.\d+)", output)
-    return sum(float(x) * 60 ** i for i, x in enumerate(reversed(match.groups()))) if match else 0
+    return get_duration(file_path)
 
 def number_to_words(n):
     words = {
@@ -94,17 +86,9 @@ def create_title_filter(title_text, aspect_ratio):
     # Adjust the font path as needed on your system.
     font_path = "/usr/share/fonts/truetype/noto/NotoSansMyanmar-Regular.ttf"
     if aspect_ratio == "9:16":
-        return (
-            "drawbox=x=0:y=80:w=iw:h=120:color=black@0.5:t=fill,"
-            f"drawtext=fontfile={font_path}:text='{title_text}':"
-            "x=(w-text_w)/2:y=120:fontcolor=white:fontsize=30"
-        )
+        return title_image(title_text, font_path, box_y=80, box_height=120, text_y=120, fontsize=30)
     else:
-        return (
-            "drawbox=x=0:y=20:w=iw:h=100:color=black@0.5:t=fill,"
-            f"drawtext=fontfile={font_path}:text='{title_text}':"
-            "x=(w-text_w)/2:y=50:fontcolor=white:fontsize=30"
-        )
+        return title_image(title_text, font_path, box_y=20, box_height=100, text_y=50, fontsize=30)
 
 tk.Button(root, text="Select Video and Split", command=split_video, padx=10, pady=5).pack(pady=30)
 
@@ -0,0 +1,144 @@
+import atexit
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+
+import run_log
+from keyframes import load_keyframes
+
+CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "fire-video-editor"
+)
+CACHE_PATH = os.path.join(CACHE_DIR, "probe.json")
+# Least recently used files are dropped past this many entries
+CACHE_SIZE = 5000
+# Unsaved probes before the cache is written out; the rest go out at exit
+SAVE_EVERY = 50
+# Bump when read_probe() records more, so older entries are probed again
+PROBE_VERSION = 2
+
+_lock = threading.Lock()
+_cache = None
+_unsaved = 0
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            with open(CACHE_PATH) as f:
+                _cache = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            _cache = OrderedDict()
+        atexit.register(save_cache)
+    return _cache
+
+
+def save_cache():
+    global _unsaved
+    with _lock:
+        if _cache is None or not _unsaved:
+            return
+        try:
+            os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+            tmp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(_cache, f)
+            os.replace(tmp_path, CACHE_PATH)
+            _unsaved = 0
+        except OSError as e:
+            print(f"Could not save probe cache: {e}")
+
+
+def _fraction(value):
+    num, _, den = (value or "0/1").partition("/")
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
+def _rotation(stream):
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            return int(side_data["rotation"]) % 360
+    return int(stream.get("tags", {}).get("rotate", 0)) % 360
+
+
+def read_probe(file_path):
+    result = run_log.run(
+        "probe", ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', file_path],
+        check=True, source=file_path
+    )
+    data = json.loads(result.stdout.decode())
+    streams = data.get("streams", [])
+    info = {
+        "duration": float(data["format"]["duration"]),
+        "streams": [{"index": s["index"], "type": s.get("codec_type"), "codec": s.get("codec_name")}
+                    for s in streams],
+        "has_audio": any(s.get("codec_type") == "audio" for s in streams),
+        "video": None,
+    }
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video:
+        rotation = _rotation(video)
+        width, height = video.get("width", 0), video.get("height", 0)
+        if rotation in (90, 270):
+            width, height = height, width
+        info["video"] = {
+            "codec": video.get("codec_name"),
+            "width": width,
+            "height": height,
+            "fps": _fraction(video.get("avg_frame_rate")) or _fraction(video.get("r_frame_rate")),
+            "rotation": rotation,
+            "profile": video.get("profile"),
+            "level": video.get("level"),
+            "pix_fmt": video.get("pix_fmt"),
+            "time_base": video.get("time_base"),
+        }
+    return info
+
+
+def probe(file_path, with_keyframes=False):
+    # Cached by path, size and mtime, so an edited file is probed again
+    global _unsaved
+    key = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    with _lock:
+        cache = _load_cache()
+        entry = cache.get(key)
+        if entry and (entry["size"], entry["mtime"], entry.get("version")) != (
+                stat.st_size, stat.st_mtime, PROBE_VERSION):
+            entry = None
+        if entry:
+            cache.move_to_end(key)
+            if not with_keyframes or "keyframe_count" in entry["info"]:
+                return entry["info"]
+
+    info = dict(entry["info"]) if entry else read_probe(file_path)
+    if with_keyframes:
+        info["keyframe_count"] = len(load_keyframes(file_path))
+
+    with _lock:
+        cache[key] = {"size": stat.st_size, "mtime": stat.st_mtime, "version": PROBE_VERSION, "info": info}
+        cache.move_to_end(key)
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+        _unsaved += 1
+        due = _unsaved >= SAVE_EVERY
+    if due:
+        save_cache()
+    return info
+
+
+def get_duration(file_path):
+    # 0 when the file cannot be probed, like the old stderr parser
+    try:
+        return probe(file_path)["duration"]
+    except (OSError, subprocess.CalledProcessError, ValueError, KeyError):
+        return 0
+
+
+def is_portrait(info):
+    video = info.get("video")
+    return bool(video) and video["height"] > video["width"]
@@ -0,0 +1,89 @@
+import os
+import subprocess
+
+import run_log
+from media_probe import CACHE_DIR, probe
+from render_cache import file_fingerprint, render_hash
+
+PROXY_DIR = os.path.join(CACHE_DIR, "proxies")
+# Small enough to decode a frame in a few milliseconds, big enough to judge
+# a crop by
+PROXY_HEIGHT = 360
+PROXY_FPS = 15
+THUMBNAILS = 20
+# The strip is as wide as a landscape proxy frame whatever the source's
+# shape, so it and the time slider under it fit on the screen
+STRIP_WIDTH = 640
+# Proxies of the least recently previewed sources are removed past this many
+PROXY_LIMIT = 20
+
+
+def proxy_paths(file_path):
+    # (proxy video, thumbnail strip), named after the source's path, size and mtime
+    key = render_hash({"path": os.path.abspath(file_path), "source": file_fingerprint(file_path),
+                       "proxy": [PROXY_HEIGHT, PROXY_FPS, THUMBNAILS, STRIP_WIDTH]})[:32]
+    return os.path.join(PROXY_DIR, f"{key}.mp4"), os.path.join(PROXY_DIR, f"{key}.png")
+
+
+def prune_proxies(keep):
+    files = sorted((os.path.join(PROXY_DIR, name) for name in os.listdir(PROXY_DIR)),
+                   key=os.path.getmtime, reverse=True)
+    proxies = [path for path in files if path.endswith(".mp4")]
+    for path in proxies[PROXY_LIMIT:]:
+        if path != keep:
+            for stale in (path, path[:-4] + ".png"):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+
+def make_proxy(file_path):
+    # One decode of the source writes both the proxy and the thumbnail strip.
+    # Only previews use them; parts are always rendered from the original.
+    proxy_path, strip_path = proxy_paths(file_path)
+    if os.path.exists(proxy_path) and os.path.exists(strip_path):
+        os.utime(proxy_path)
+        return proxy_path, strip_path
+    os.makedirs(PROXY_DIR, exist_ok=True)
+    duration = probe(file_path)["duration"]
+    tmp_proxy, tmp_strip = proxy_path + ".tmp.mp4", strip_path + ".tmp.png"
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error', '-i', file_path, '-filter_complex',
+        f"[0:v]fps={PROXY_FPS},scale=-2:{PROXY_HEIGHT},split[proxy][thumbs];"
+        f"[thumbs]fps={THUMBNAILS}/{duration},scale={STRIP_WIDTH // THUMBNAILS}:-2,tile={THUMBNAILS}x1[strip]",
+        # A keyframe every second, so any frame is a short decode away
+        '-map', '[proxy]', '-an', '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '30',
+        '-g', str(PROXY_FPS), tmp_proxy,
+        '-map', '[strip]', '-frames:v', '1', tmp_strip,
+    ]
+    try:
+        result = run_log.run("proxy", cmd, source=file_path, media_seconds=duration)
+        if result.returncode != 0:
+            raise ValueError(f"Could not make a preview of {file_path}: {result.stderr.decode().strip()}")
+        os.replace(tmp_strip, strip_path)
+        os.replace(tmp_proxy, proxy_path)
+    finally:
+        for path in (tmp_proxy, tmp_strip):
+            if os.path.exists(path):
+                os.remove(path)
+    prune_proxies(keep=proxy_path)
+    return proxy_path, strip_path
+
+
+def crop_outline(aspect_ratio, offset, scale=1.0):
+    # Draws where crop_filter_for(aspect_ratio, offset) would crop, on a frame
+    # scale times the size of the source. crop keeps its window inside the
+    # frame, so the outline is clamped the same way.
+    if aspect_ratio != "9:16":
+        return ""
+    x = f"min(max((iw-ih*9/16)/2 + {offset * scale}\\,0)\\,iw-ih*9/16)"
+    return f"drawbox=x={x}:y=0:w=ih*9/16:h=ih:color=red:t=3"
+
+
+def preview_frame(proxy_path, time, video_filter=""):
+    # PNG bytes of the proxy frame at time, for Tk's PhotoImage
+    cmd = ['ffmpeg', '-loglevel', 'error', '-ss', str(time), '-i', proxy_path, '-frames:v', '1']
+    if video_filter:
+        cmd += ['-vf', video_filter]
+    cmd += ['-f', 'image2pipe', '-c:v', 'png', '-']
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return result.stdout if result.returncode == 0 else None
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import re
+
+# Written next to the parts; maps each part's file name to the hash of
+# everything that went into rendering it
+MANIFEST_NAME = ".fire-video-editor-parts.json"
+
+
+def file_fingerprint(path):
+    # Size and mtime, like the probe cache; None for a missing file
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+def fonts_in(video_filter):
+    return sorted(set(re.findall(r"fontfile=([^:,]+)", video_filter)))
+
+
+def render_hash(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+class RenderManifest:
+    # The manifests of every output directory a job writes to, loaded on
+    # first use and saved after each change so an interrupted job keeps
+    # the parts it finished
+    def __init__(self):
+        self._entries = {}
+
+    def _load(self, output_dir):
+        if output_dir not in self._entries:
+            try:
+                with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+                    self._entries[output_dir] = json.load(f)
+            except (OSError, ValueError):
+                self._entries[output_dir] = {}
+        return self._entries[output_dir]
+
+    def _save(self, output_dir):
+        path = os.path.join(output_dir, MANIFEST_NAME)
+        try:
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries[output_dir], f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not save render manifest: {e}")
+
+    def matches(self, output_path, digest):
+        output_dir, name = os.path.split(os.path.abspath(output_path))
+        return self._load(output_dir).get(name) == digest
+
+    def record(self, output_path, digest):
+        output_dir, name = os.path.split(os.path.abspath(output_path))
+        self._load(output_dir)[name] = digest
+        self._save(output_dir)
+
+    def forget(self, output_paths):
+        # Called before parts are rendered again: a failed render must not
+        # leave a half-written file that still matches its old hash
+        changed = set()
+        for output_path in output_paths:
+            output_dir, name = os.path.split(os.path.abspath(output_path))
+            if self._load(output_dir).pop(name, None) is not None:
+                changed.add(output_dir)
+        for output_dir in changed:
+            self._save(output_dir)
@@ -0,0 +1,228 @@
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:
+    # Windows: stages only get this process's own CPU time
+    resource = None
+
+# Run log: one JSON line per stage - the probe step, every ffmpeg and
+# ffprobe process and each whole job - so slow hosts and regressions show up
+# in a graph. Off until start() is called; stages are still timed, but
+# nothing is kept or written.
+HOST = platform.node()
+METRIC_PREFIX = "fire_video_editor"
+# Prometheus counters summed per stage from the records' fields
+COUNTERS = {
+    "wall": ("seconds_total", "Wall time spent in the stage"),
+    "cpu": ("cpu_seconds_total", "CPU time of the stage's processes"),
+    "media_seconds": ("media_seconds_total", "Seconds of media the stage ran through"),
+    "input_bytes": ("input_bytes_total", "Bytes read by the stage's processes"),
+    "output_bytes": ("output_bytes_total", "Bytes written by the stage's processes"),
+}
+
+METRIC_LINE = re.compile(rf'^{METRIC_PREFIX}_stage_(\w+)\{{host="(.*)",stage="(\w+)"\}} (\S+)$')
+
+_lock = threading.Lock()
+_log = None
+
+
+def start(path=None, metrics_path=None):
+    # Appends records to path, if given; metrics_path, if given, gets a
+    # Prometheus text dump of the totals each time a job finishes
+    global _log
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _lock:
+        _log = {"path": path, "metrics_path": metrics_path, "run": uuid.uuid4().hex[:12],
+                "totals": load_metrics(metrics_path) if metrics_path else {}}
+
+
+def load_metrics(path):
+    # Totals of this host from an earlier dump, so counters keep counting up
+    # across runs instead of starting again from zero
+    keys = {name: key for key, (name, _) in COUNTERS.items()}
+    keys.update({"runs_total": "runs", "failures_total": "failures", "peak_rss_bytes": "peak_rss"})
+    totals = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                match = METRIC_LINE.match(line.strip())
+                if match and match.group(1) in keys and match.group(2) == _label(HOST):
+                    value = float(match.group(4))
+                    totals.setdefault(match.group(3), {})[keys[match.group(1)]] = (
+                        int(value) if value.is_integer() else value)
+    except (OSError, ValueError):
+        return {}
+    return totals
+
+
+def enabled():
+    return _log is not None
+
+
+def record(stage, **fields):
+    if _log is None:
+        return
+    entry = {"time": round(time.time(), 3), "host": HOST, "run": _log["run"], "pid": os.getpid(),
+             "stage": stage}
+    entry.update(fields)
+    line = json.dumps(entry)
+    with _lock:
+        totals = _log["totals"].setdefault(stage, {})
+        totals["runs"] = totals.get("runs", 0) + 1
+        totals["failures"] = totals.get("failures", 0) + (not entry.get("ok", True))
+        totals["peak_rss"] = max(totals.get("peak_rss", 0), entry.get("peak_rss") or 0)
+        for key in COUNTERS:
+            totals[key] = totals.get(key, 0) + (entry.get(key) or 0)
+        if not _log["path"]:
+            return
+        try:
+            with open(_log["path"], "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Could not write run log: {e}")
+
+
+def _rss_bytes(maxrss):
+    # ru_maxrss is KB on Linux, bytes on macOS
+    return maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+def _proc_io(pid):
+    # Bytes the process read and wrote, page cache included; Linux only
+    try:
+        with open(f"/proc/{pid}/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+def wait_child(process):
+    # Waits for process like Popen.wait(), and returns what it used on its
+    # own: {"cpu", "peak_rss", "input_bytes", "output_bytes"}, with None for
+    # what this platform cannot tell. The process is left a zombie for a
+    # moment so its I/O counters can still be read, then reaped with wait4.
+    usage = {"cpu": None, "peak_rss": None, "input_bytes": None, "output_bytes": None}
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return usage
+    try:
+        if hasattr(os, "waitid"):
+            os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            usage["input_bytes"], usage["output_bytes"] = _proc_io(process.pid)
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped by Popen, e.g. by the kill() of a cancel
+        process.wait()
+        return usage
+    process.returncode = os.waitstatus_to_exitcode(status)
+    usage["cpu"] = round(rusage.ru_utime + rusage.ru_stime, 3)
+    usage["peak_rss"] = _rss_bytes(rusage.ru_maxrss)
+    return usage
+
+
+def run(stage, cmd, check=False, **fields):
+    # subprocess.run(cmd, stdout=PIPE, stderr=PIPE, check=check) that logs
+    # the process as a stage
+    if _log is None:
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=check)
+    started = time.perf_counter()
+    # stderr goes to a file, so a chatty process cannot block on a full pipe
+    # while stdout is being read
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors, stdin=subprocess.DEVNULL)
+        with process:
+            stdout = process.stdout.read()
+            usage = wait_child(process)
+        errors.seek(0)
+        stderr = errors.read()
+    record(stage, ok=process.returncode == 0, returncode=process.returncode,
+           wall=round(time.perf_counter() - started, 3), **usage, **fields)
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+class Stage:
+    # Times a stretch of work in this process: wall time, and CPU time of
+    # this process and of every child that finished in it. Children of other
+    # threads count too, so jobs run one at a time give exact figures.
+    # fields are logged with it and may be added to before the end;
+    # peak_rss is raised by the processes run for the stage.
+    def __init__(self, stage, **fields):
+        self.stage = stage
+        self.id = uuid.uuid4().hex[:12]
+        self.fields = fields
+        self.peak_rss = 0
+
+    def add_child(self, usage):
+        with _lock:
+            self.peak_rss = max(self.peak_rss, usage.get("peak_rss") or 0)
+
+    def _cpu(self):
+        if resource is None:
+            return time.process_time()
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.cpu_started = self._cpu()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        fields = dict(self.fields)
+        if error_type is not None:
+            fields["ok"] = False
+            fields["error"] = str(error) or error_type.__name__
+        record(self.stage, id=self.id, wall=round(time.perf_counter() - self.started, 3),
+               cpu=round(self._cpu() - self.cpu_started, 3), peak_rss=self.peak_rss or None, **fields)
+        if self.stage == "job":
+            write_metrics()
+        return False
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_metrics():
+    # Prometheus text format, e.g. for node_exporter's textfile collector;
+    # written whole and renamed into place so it is never read half done
+    if _log is None or not _log["metrics_path"]:
+        return
+    path = _log["metrics_path"]
+    with _lock:
+        totals = {stage: dict(values) for stage, values in _log["totals"].items()}
+    metrics = [("runs_total", "counter", "Times the stage ran", "runs"),
+               ("failures_total", "counter", "Times the stage failed", "failures")]
+    metrics += [(name, "counter", help_text, key) for key, (name, help_text) in COUNTERS.items()]
+    metrics.append(("peak_rss_bytes", "gauge", "Largest resident set of one of the stage's processes", "peak_rss"))
+    lines = []
+    for name, kind, help_text, key in metrics:
+        lines.append(f"# HELP {METRIC_PREFIX}_stage_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_{name} {kind}")
+        for stage in sorted(totals):
+            value = totals[stage].get(key, 0)
+            lines.append(f'{METRIC_PREFIX}_stage_{name}{{host="{_label(HOST)}",stage="{_label(stage)}"}} '
+                         f'{round(value, 3) if isinstance(value, float) else value}')
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write metrics: {e}")
@@ -0,0 +1,121 @@
+import re
+
+import run_log
+from edl import MIN_PIECE
+from media_probe import probe
+from source_index import load_index
+
+# scdet scores run from 0 to 100; hard cuts score well above this
+SCENE_THRESHOLD = 8
+SILENCE_NOISE = "-35dB"
+SILENCE_MIN = 0.3
+# A cut placed in a silence stays this far from the speech either side
+SILENCE_MARGIN = 0.15
+# Scene scores barely change with resolution, and a small frame is cheap to compare
+ANALYSIS_HEIGHT = 180
+SETTINGS = {"threshold": SCENE_THRESHOLD, "noise": SILENCE_NOISE, "min_silence": SILENCE_MIN}
+
+SCENE_LINE = re.compile(r"lavfi\.scd\.score: ([\d.]+), lavfi\.scd\.time: ([\d.]+)")
+SILENCE_START = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END = re.compile(r"silence_end: ([\d.]+)")
+
+
+def read_scenes(file_path):
+    # One decode feeds both detectors; they log what they find to stderr
+    info = probe(file_path)
+    graph = f"[0:v]scale=-2:{ANALYSIS_HEIGHT},scdet=threshold={SCENE_THRESHOLD}[v]"
+    maps = ['-map', '[v]']
+    if info["has_audio"]:
+        graph += f";[0:a]silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN}[a]"
+        maps += ['-map', '[a]']
+    result = run_log.run(
+        "scenes", ['ffmpeg', '-hide_banner', '-nostats', '-i', file_path, '-filter_complex', graph]
+        + maps + ['-f', 'null', '-'],
+        check=True, source=file_path, media_seconds=info["duration"]
+    )
+    scenes, silences, silence_start = [], [], None
+    for line in result.stderr.decode(errors="replace").splitlines():
+        match = SCENE_LINE.search(line)
+        if match:
+            scenes.append([float(match.group(2)), float(match.group(1))])
+            continue
+        match = SILENCE_START.search(line)
+        if match:
+            silence_start = max(0.0, float(match.group(1)))
+            continue
+        match = SILENCE_END.search(line)
+        if match and silence_start is not None:
+            silences.append([silence_start, float(match.group(1))])
+            silence_start = None
+    if silence_start is not None:
+        # Silent to the end of the file
+        silences.append([silence_start, info["duration"]])
+    return {"scenes": scenes, "silences": silences}
+
+
+def load_scenes(file_path):
+    # {"scenes": [[time, score], ...], "silences": [[start, end], ...]}
+    return load_index(file_path, "scenes", read_scenes, SETTINGS)
+
+
+def cut_candidates(index, kept):
+    # Scene changes and silences moved onto the edited timeline, as
+    # (start, end, kind) ranges a cut may fall in; a scene change is a
+    # range of one point. Anything inside a removed range is dropped.
+    candidates = []
+    position = 0.0
+    for kept_start, kept_end in kept:
+        for time, _ in index["scenes"]:
+            if kept_start < time < kept_end:
+                edited = position + time - kept_start
+                candidates.append((edited, edited, "scene change"))
+        for start, end in index["silences"]:
+            margin = min(SILENCE_MARGIN, (end - start) / 2)
+            start, end = max(start + margin, kept_start), min(end - margin, kept_end)
+            if start <= end:
+                candidates.append((position + start - kept_start, position + end - kept_start, "silence"))
+        position += kept_end - kept_start
+    return candidates
+
+
+def snap_boundaries(length, segment_length, candidates, tolerance, min_length, max_length):
+    # Where each part starts on the edited timeline, as (time, shift, kind):
+    # every cut after the first is moved from its place on the fixed
+    # segment_length grid to the nearest candidate within tolerance, while
+    # parts stay between min_length and max_length long. kind is None for
+    # a cut that found no candidate; it stays on the grid, or as close to it
+    # as the length limits allow.
+    count = int(length // segment_length) + (1 if length % segment_length > 0 else 0)
+    # The latest each cut may go on its own: within tolerance of the grid,
+    # and a short last part may grow, but never shrink below what the grid
+    # left it
+    latest = [min(i * segment_length + tolerance, length - min(min_length, length - i * segment_length))
+              for i in range(count)]
+    # ... and so that every later cut still fits min_length after it. Without
+    # this, one cut moved later pushes all the cuts after it later too.
+    for i in range(count - 2, 0, -1):
+        latest[i] = min(latest[i], latest[i + 1] - min_length)
+    cuts = [(0.0, 0.0, None)]
+    for i in range(1, count):
+        target = i * segment_length
+        previous = cuts[-1][0]
+        low = max(target - tolerance, previous + min_length)
+        high = min(latest[i], previous + max_length)
+        best = None
+        for start, end, kind in candidates:
+            start, end = max(start, low), min(end, high)
+            if start > end:
+                continue
+            time = min(max(target, start), end)
+            if best is None or abs(time - target) < abs(best[0] - target):
+                best = (time, kind)
+        if best:
+            time, kind = best
+        else:
+            # When the limits conflict, the part before the cut keeps its
+            # minimum length; only the last part may be short
+            time, kind = (min(max(target, low), high) if low <= high else low), None
+        if time > length - MIN_PIECE:
+            break
+        cuts.append((time, time - target, kind))
+    return cuts
@@ -0,0 +1,31 @@
+import json
+import os
+
+
+def index_path(file_path, kind):
+    # Hidden file next to the source: ("clip.mp4", "keyframes") -> ".clip.mp4.keyframes.json"
+    directory, name = os.path.split(file_path)
+    return os.path.join(directory, f".{name}.{kind}.json")
+
+
+def load_index(file_path, kind, read, settings=None):
+    # read(file_path), cached next to the source and read again when the
+    # source's size or mtime, or the settings it was read with, change
+    stat = os.stat(file_path)
+    path = index_path(file_path, kind)
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if (cached["size"], cached["mtime"], cached["settings"]) == (stat.st_size, stat.st_mtime, settings):
+            return cached["index"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = read(file_path)
+    try:
+        with open(path, "w") as f:
+            json.dump({"size": stat.st_size, "mtime": stat.st_mtime, "settings": settings, "index": index}, f)
+    except OSError:
+        # Read-only source folder: still usable, just not cached
+        pass
+    return index
@@ -0,0 +1,292 @@
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+import run_log
+from edl import load_edl, parse_time
+from media_probe import CACHE_DIR, get_duration
+from scenes import load_scenes
+from split_engine import (
+    ASPECT_NAMES, DEFAULT_SPLIT_MODE, MAX_SEGMENT_LENGTH, MIN_SEGMENT_LENGTH, SPLIT_MODES, crop_filter_for,
+    expand_profiles, make_profile, output_ok, plan_parts, split_profiles
+)
+from titles import title_image
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".wmv", ".flv")
+QUEUE_PATH = os.path.join(CACHE_DIR, "queue.json")
+DEFAULT_FONT = "/usr/share/fonts/truetype/noto/NotoSansMyanmar-Regular.ttf"
+
+# Parts written by an earlier run, e.g. "talk_Part_Three.mp4"
+PART_OUTPUT = re.compile(r"_Part_\w+\.mp4$")
+
+
+def create_title_filter(title_text, aspect_ratio, font_path=DEFAULT_FONT):
+    if aspect_ratio == "9:16":
+        return title_image(title_text, font_path, box_y=80, box_height=120, text_y=120, fontsize=30)
+    else:
+        return title_image(title_text, font_path, box_y=20, box_height=100, text_y=50, fontsize=30)
+
+
+def segment_length(value):
+    seconds = int(value)
+    if not MIN_SEGMENT_LENGTH <= seconds <= MAX_SEGMENT_LENGTH:
+        raise argparse.ArgumentTypeError(
+            f"segment length must be between {MIN_SEGMENT_LENGTH} and {MAX_SEGMENT_LENGTH} seconds")
+    return seconds
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be 1 or more")
+    return number
+
+
+def non_negative_float(value):
+    number = float(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError("must be 0 or more")
+    return number
+
+
+def parse_profile(spec):
+    # "9:16", or key=value pairs: "aspect=9:16,offset=200,size=1080x1920,bitrate=6M,name=tall"
+    profile = {"name": "", "aspect": "16:9", "offset": 0, "size": None, "bitrate": None}
+    if "=" not in spec:
+        spec = f"aspect={spec}"
+    for item in spec.split(","):
+        key, _, value = item.partition("=")
+        if key not in profile:
+            raise argparse.ArgumentTypeError(f"unknown profile setting: {key}")
+        profile[key] = int(value) if key == "offset" else value
+    if profile["aspect"] not in ASPECT_NAMES:
+        raise argparse.ArgumentTypeError("profile aspect must be 9:16 or 16:9")
+    if profile["size"] and not re.fullmatch(r"\d+x\d+", profile["size"]):
+        raise argparse.ArgumentTypeError("profile size must look like 1080x1920")
+    return profile
+
+
+def build_profiles(specs, font):
+    return [
+        make_profile(lambda title, aspect=spec["aspect"]: create_title_filter(title, aspect, font),
+                     crop_filter_for(spec["aspect"], spec["offset"]), name=spec["name"],
+                     resolution=spec["size"], video_bitrate=spec["bitrate"])
+        for spec in specs
+    ]
+
+
+def expand_inputs(patterns):
+    # Files, globs and whole directories, skipping parts from earlier runs
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in sorted(os.listdir(pattern))]
+        else:
+            matches = sorted(glob.glob(pattern)) or [pattern]
+        for path in matches:
+            if (os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS)
+                    and not PART_OUTPUT.search(path)):
+                files.append(os.path.abspath(path))
+            elif not os.path.exists(path):
+                print(f"No such file: {path}")
+    return list(dict.fromkeys(files))
+
+
+def load_queue(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"jobs": []}
+
+
+def save_queue(queue, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(queue, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def add_jobs(queue, sources, settings):
+    # Adding a job that is already queued runs it again from the start, so
+    # a rerun reaches the render manifest (or --force) instead of being
+    # skipped as done; unchanged parts are still reused from the manifest
+    for source in sources:
+        job = next((job for job in queue["jobs"] if job["source"] == source and job["settings"] == settings),
+                   None)
+        if job:
+            job["status"] = "pending"
+            job["done_parts"] = []
+            continue
+        queue["jobs"].append({"source": source, "settings": settings, "status": "pending", "done_parts": []})
+
+
+def run_job(job, queue, queue_path, jobs, threads, reuse=True):
+    settings = job["settings"]
+    source = job["source"]
+    duration = get_duration(source)
+    if duration == 0:
+        print(f"Could not determine video duration: {source}")
+        return False
+
+    # Queues written before edit lists existed store at most one cut
+    cuts = settings.get("cuts") or ([settings["cut"]] if settings.get("cut") else [])
+    # Queues written before output profiles existed store a single aspect ratio
+    specs = settings.get("profiles") or [parse_profile(f"aspect={settings['aspect']},offset={settings['crop_offset']}")]
+    profiles = build_profiles(specs, settings["font"])
+    scene_index = None
+    if settings.get("snap"):
+        print(f"{source}: finding scene changes and silences")
+        scene_index = load_scenes(source)
+    # JSON keys are strings; queues written before part titles existed have none
+    part_titles = {int(number): title for number, title in settings.get("part_titles", {}).items()}
+    planned = plan_parts(source, duration, settings["segment"], settings["title"], output_dir=settings["output_dir"],
+                         removed=cuts, scene_index=scene_index, tolerance=settings.get("snap") or 0,
+                         part_titles=part_titles)
+    for part in planned:
+        if part["index"] == 1 or not scene_index:
+            continue
+        moved = (f"{abs(part['shift']):.2f}s {'later' if part['shift'] > 0 else 'earlier'}"
+                 if abs(part["shift"]) >= 0.01 else "where it was")
+        if part["snapped_to"]:
+            print(f"  {part['title']} starts {moved}, at a {part['snapped_to']}")
+        elif moved != "where it was":
+            print(f"  {part['title']} starts {moved}, to keep parts between "
+                  f"{MIN_SEGMENT_LENGTH} and {MAX_SEGMENT_LENGTH}s long")
+        else:
+            print(f"  {part['title']}: no scene change or silence within {settings['snap']}s")
+    parts = expand_profiles(planned, profiles)
+    # Resume: parts finished by an earlier run are left alone
+    todo = [part for part in parts
+            if not (part["output_path"] in job["done_parts"] and output_ok(part["output_path"]))]
+    if not todo:
+        return True
+    print(f"{source}: {len(todo)} of {len(parts)} part(s) to render")
+
+    def record(part, ok):
+        if ok and part["output_path"] not in job["done_parts"]:
+            job["done_parts"].append(part["output_path"])
+            save_queue(queue, queue_path)
+
+    _, failed = split_profiles(source, todo, profiles, mode=settings["mode"], jobs=jobs, threads=threads,
+                               overwrite=True, reuse=reuse, on_result=record)
+    return not failed
+
+
+def run_queue(queue, queue_path, jobs, threads, reuse=True):
+    failures = 0
+    for job in queue["jobs"]:
+        if job["status"] == "done":
+            continue
+        job["status"] = "running"
+        save_queue(queue, queue_path)
+        try:
+            ok = run_job(job, queue, queue_path, jobs, threads, reuse)
+        except (ValueError, OSError, subprocess.CalledProcessError) as e:
+            # Bad settings, such as cuts that remove everything, a title that
+            # cannot be drawn or an output folder that cannot be written,
+            # fail this job and leave the rest
+            print(f"{job['source']}: {e}")
+            ok = False
+        job["status"] = "done" if ok else "failed"
+        save_queue(queue, queue_path)
+        failures += not ok
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split videos into titled parts without the GUI")
+    parser.add_argument("inputs", nargs="*", help="video files, globs or directories")
+    parser.add_argument("--segment", type=segment_length, help="segment length in seconds (10-600)")
+    parser.add_argument("--title", default="Video", help="title shown on every part")
+    parser.add_argument("--part-title", nargs=2, metavar=("N", "TEXT"), action="append", dest="part_titles",
+                        default=[], help="title for part N instead of \"TITLE - Part N\"; repeatable")
+    parser.add_argument("--aspect", choices=["9:16", "16:9"], default="16:9", help="output aspect ratio")
+    parser.add_argument("--cut", nargs=2, metavar=("START", "END"), type=parse_time, action="append",
+                        dest="cuts", default=[], help="section to cut out, HH:MM:SS or seconds; repeatable")
+    parser.add_argument("--edl", help="file of sections to cut out, one START END per line")
+    parser.add_argument("--snap", type=non_negative_float, metavar="SECONDS",
+                        help="move each part boundary up to this far to the nearest scene change or silence")
+    parser.add_argument("--crop-offset", type=int, default=0, help="move the 9:16 crop right by this many pixels")
+    parser.add_argument("--profile", action="append", type=parse_profile, dest="profiles",
+                        help="output profile, e.g. aspect=9:16,offset=200,size=1080x1920,bitrate=6M; "
+                             "repeat to render several formats from one decode (overrides --aspect)")
+    parser.add_argument("--font", default=DEFAULT_FONT, help="font file for the titles")
+    parser.add_argument("--output-dir", help="where to write parts (default: next to each source)")
+    parser.add_argument("--mode", choices=SPLIT_MODES, default=DEFAULT_SPLIT_MODE)
+    parser.add_argument("--jobs", type=positive_int, help="parts encoded at once (default: one per 8 cores)")
+    parser.add_argument("--threads", type=positive_int, help="encoder threads per job")
+    parser.add_argument("--force", action="store_true",
+                        help="render every part again, even parts whose settings have not changed")
+    parser.add_argument("--log", metavar="FILE",
+                        help="append a JSON line per probe, ffmpeg process and job, with timings and resource use")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write Prometheus text-format totals of the same to FILE after every job")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="job queue file")
+    parser.add_argument("--resume", action="store_true", help="finish the unfinished jobs in the queue")
+    parser.add_argument("--status", action="store_true", help="show the queue and exit")
+    args = parser.parse_args(argv)
+
+    queue = load_queue(args.queue)
+    if args.status:
+        for job in queue["jobs"]:
+            print(f"{job['status']:>8}  {len(job['done_parts']):3} part(s)  {job['source']}")
+        return 0
+
+    if args.inputs:
+        if args.segment is None:
+            parser.error("--segment is required when adding videos")
+        sources = expand_inputs(args.inputs)
+        if not sources:
+            parser.error("no videos found")
+        cuts = args.cuts
+        if args.edl:
+            try:
+                cuts = cuts + load_edl(args.edl)
+            except (OSError, ValueError) as e:
+                parser.error(f"could not read edit list: {e}")
+        if any(end <= start for start, end in cuts):
+            parser.error("every cut must end after it starts")
+        part_titles = {}
+        for number, text in args.part_titles:
+            if not number.isdigit() or int(number) < 1:
+                parser.error(f"--part-title needs a part number, not {number!r}")
+            part_titles[str(int(number))] = text
+        profiles = args.profiles or [parse_profile(f"aspect={args.aspect},offset={args.crop_offset}")]
+        if len(profiles) > 1:
+            for profile in profiles:
+                profile["name"] = profile["name"] or ASPECT_NAMES[profile["aspect"]]
+            names = [profile["name"] for profile in profiles]
+            if len(set(names)) != len(names):
+                parser.error("profiles with the same aspect ratio need a name=")
+        settings = {
+            "segment": args.segment,
+            "title": args.title,
+            "part_titles": part_titles,
+            "profiles": profiles,
+            "cuts": [list(cut) for cut in cuts],
+            "font": args.font,
+            "output_dir": os.path.abspath(args.output_dir) if args.output_dir else None,
+            "mode": args.mode,
+            "snap": args.snap,
+        }
+        add_jobs(queue, sources, settings)
+        save_queue(queue, args.queue)
+    elif not args.resume:
+        parser.error("give videos to split, or --resume")
+
+    if args.log or args.metrics:
+        run_log.start(args.log, args.metrics)
+
+    failures = run_queue(queue, args.queue, args.jobs, args.threads, reuse=not args.force)
+    print(f"Batch finished: {sum(job['status'] == 'done' for job in queue['jobs'])} job(s) done, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,804 @@
+import math
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import run_log
+from edl import MIN_PIECE, edited_duration, kept_ranges, source_pieces
+from keyframes import load_keyframes, nearest_keyframe, next_keyframe
+from media_probe import is_portrait, probe
+from render_cache import RenderManifest, file_fingerprint, fonts_in, render_hash
+from scenes import cut_candidates, snap_boundaries
+from titles import overlay_graph, render_title
+
+# Where the part's start time goes in the ffmpeg command:
+#   "input"  - -ss before -i. ffmpeg jumps to the nearest keyframe before the
+#              start and (accurate_seek, on by default when transcoding) decodes
+#              and drops only the frames up to the exact start, so every part
+#              costs the same no matter how deep into the file it begins.
+#   "hybrid" - input-seek to a point HYBRID_PREROLL seconds early, then
+#              output-seek the rest. Frame accurate even with demuxers that
+#              seek poorly, at the cost of decoding a few seconds extra.
+#   "output" - the old behaviour: -ss/-to after -i, which decodes and throws
+#              away everything before the start of every part.
+SEEK_MODES = ("input", "hybrid", "output")
+DEFAULT_SEEK_MODE = "input"
+HYBRID_PREROLL = 10
+
+# "single" decodes the source once and writes every part from one ffmpeg
+# process; the seek modes above run one ffmpeg per part.
+#   "copy"     - no re-encode at all: parts are moved to the nearest keyframe
+#                and stream-copied, so splitting runs at disk speed.
+#   "smartcut" - exact cut points: only the partial GOP from each cut to the
+#                next keyframe is re-encoded, the rest is stream-copied.
+# Neither copy mode can crop or draw titles.
+COPY_MODES = ("copy", "smartcut")
+SPLIT_MODES = ("single",) + SEEK_MODES + COPY_MODES
+DEFAULT_SPLIT_MODE = "single"
+
+# Parts written by one single-pass process. Each batch input-seeks to its
+# first part, so splitting very long sources does not keep hundreds of
+# outputs open at once.
+SINGLE_PASS_BATCH = 32
+
+ENCODER_ARGS = ['-c:v', 'libx264', '-c:a', 'aac', '-strict', 'experimental']
+
+# ffprobe's H.264 profile names -> libx264's; the smart-cut head is encoded
+# with the source's profile so the joined stream stays one profile
+X264_PROFILES = {
+    "Constrained Baseline": "baseline",
+    "Baseline": "baseline",
+    "Main": "main",
+    "High": "high",
+    "High 10": "high10",
+    "High 4:2:2": "high422",
+    "High 4:4:4 Predictive": "high444",
+}
+
+# Bump when the commands built here change what a part looks like, so
+# parts rendered by older versions are not reused
+RENDER_VERSION = 2
+
+# Cores each libx264 process keeps busy before returns flatten out; on big
+# encode boxes the rest are better spent on running more parts at once.
+CORES_PER_JOB = 8
+
+
+def default_jobs():
+    return max(1, (os.cpu_count() or 1) // CORES_PER_JOB)
+
+
+def default_threads(jobs):
+    # Share the cores between the running jobs; 0 leaves it to ffmpeg
+    if jobs <= 1:
+        return 0
+    return max(1, (os.cpu_count() or 1) // jobs)
+
+
+def encoder_args(threads=0):
+    return ENCODER_ARGS + (['-threads', str(threads)] if threads else [])
+
+
+def seek_args(start_time, end_time, seek_mode=DEFAULT_SEEK_MODE):
+    # Returns (args before -i, args after -i)
+    duration = end_time - start_time
+    if seek_mode == "input":
+        return ['-ss', str(start_time)], ['-t', str(duration)]
+    if seek_mode == "hybrid":
+        coarse = max(0, start_time - HYBRID_PREROLL)
+        fine = start_time - coarse
+        return ['-ss', str(coarse)], ['-ss', str(fine), '-t', str(duration)]
+    if seek_mode == "output":
+        return [], ['-ss', str(start_time), '-to', str(end_time)]
+    raise ValueError(f"Unknown seek mode: {seek_mode}")
+
+
+def build_part_command(file_path, output_path, start_time, end_time, video_filter,
+                       seek_mode=DEFAULT_SEEK_MODE, threads=0, encoder=None):
+    input_args, output_args = seek_args(start_time, end_time, seek_mode)
+    return (
+        ['ffmpeg'] + input_args + ['-i', file_path, '-vf', video_filter]
+        + output_args + (encoder or encoder_args(threads)) + [output_path]
+    )
+
+
+def number_to_words(n):
+    words = {
+        1: "One", 2: "Two", 3: "Three", 4: "Four", 5: "Five",
+        6: "Six", 7: "Seven", 8: "Eight", 9: "Nine", 10: "Ten",
+        11: "Eleven", 12: "Twelve", 13: "Thirteen", 14: "Fourteen", 15: "Fifteen",
+        16: "Sixteen", 17: "Seventeen", 18: "Eighteen", 19: "Nineteen", 20: "Twenty"
+    }
+    return words.get(n, str(n))
+
+
+# Part lengths the GUIs and the CLI accept; boundaries moved to scene
+# changes keep every part but the last inside them
+MIN_SEGMENT_LENGTH = 10
+MAX_SEGMENT_LENGTH = 600
+
+# File name suffix for each aspect ratio when a job renders both
+ASPECT_NAMES = {"9:16": "portrait", "16:9": "landscape"}
+
+
+def crop_filter_for(aspect_ratio, offset=0):
+    # Portrait window cut from a landscape frame, moved right by offset pixels
+    if aspect_ratio != "9:16":
+        return ""
+    if offset:
+        return f"crop=ih*9/16:ih:((iw-ih*9/16)/2 + {offset}):0"
+    return "crop=ih*9/16:ih:(iw-ih*9/16)/2:0"
+
+
+def plan_parts(file_path, duration, segment_length, title_base, cut_start=None, cut_end=None,
+               part_name=number_to_words, output_dir=None, removed=(), scene_index=None, tolerance=0,
+               part_titles=None):
+    # Parts are cut on the edited timeline, the source with every removed
+    # range (removed, plus cut_start..cut_end) taken out, so each part is
+    # segment_length long however many cuts fall inside it. "pieces" are the
+    # source ranges a part is made of; start and end are its first and last
+    # source times.
+    # With a scene_index from scenes.load_scenes, each boundary moves up to
+    # tolerance seconds to the nearest scene change or silence; "shift" and
+    # "snapped_to" record how far the part's start moved and to what.
+    # part_titles maps part numbers to titles used instead of
+    # "<title_base> - Part <n>"; the part keeps its file name.
+    part_titles = part_titles or {}
+    output_dir = output_dir or os.path.dirname(file_path)
+    base_filename = os.path.splitext(os.path.basename(file_path))[0]
+    removed = list(removed)
+    if cut_start is not None and cut_end is not None:
+        removed.append((cut_start, cut_end))
+    if tolerance < 0:
+        raise ValueError(f"Snap tolerance must be 0 or more, not {tolerance}")
+    kept = kept_ranges(duration, removed)
+    if not kept:
+        raise ValueError("The cuts remove the whole video")
+    edited = edited_duration(kept)
+    if scene_index and tolerance:
+        cuts = snap_boundaries(edited, segment_length, cut_candidates(scene_index, kept), tolerance,
+                               MIN_SEGMENT_LENGTH, MAX_SEGMENT_LENGTH)
+    else:
+        num_segments = int(edited // segment_length) + (1 if edited % segment_length > 0 else 0)
+        cuts = [(i * segment_length, 0.0, None) for i in range(num_segments)]
+    ends = [time for time, _, _ in cuts[1:]] + [edited]
+
+    parts = []
+    for (start, shift, kind), end in zip(cuts, ends):
+        pieces = source_pieces(kept, start, end)
+        if not pieces:
+            continue
+
+        part_label = f"Part {part_name(len(parts) + 1)}"
+        parts.append({
+            "index": len(parts) + 1,
+            "start": pieces[0][0],
+            "end": pieces[-1][1],
+            "pieces": pieces,
+            "title": part_titles.get(len(parts) + 1, f"{title_base} - {part_label}"),
+            "output_path": os.path.join(output_dir, f"{base_filename}_{part_label.replace(' ', '_')}.mp4"),
+            "shift": shift,
+            "snapped_to": kind,
+        })
+    return parts
+
+
+def part_pieces(part):
+    # Parts planned by hand may leave out "pieces" when they are one range
+    return part.get("pieces") or [(part["start"], part["end"])]
+
+
+def make_profile(title_filter, crop_filter="", name="", resolution=None, video_bitrate=None):
+    # One output format of a job. With several profiles every part is written
+    # once per profile, with the profile's name added to the file name.
+    return {"name": name, "crop": crop_filter, "title_filter": title_filter,
+            "resolution": resolution, "video_bitrate": video_bitrate}
+
+
+def expand_profiles(parts, profiles):
+    if len(profiles) == 1:
+        return [dict(part, profile=0) for part in parts]
+    names = [profile["name"] for profile in profiles]
+    if len(set(names)) != len(names) or not all(names):
+        raise ValueError("Every output profile needs its own name")
+    expanded = []
+    for part in parts:
+        root, ext = os.path.splitext(part["output_path"])
+        for k, profile in enumerate(profiles):
+            expanded.append(dict(part, profile=k, output_path=f"{root}_{profile['name']}{ext}"))
+    return expanded
+
+
+def profile_chain(profile):
+    # Crop and scale, shared by every part of the profile
+    steps = [profile["crop"]] if profile["crop"] else []
+    if profile["resolution"]:
+        width, height = profile["resolution"].split("x")
+        steps.append(f"scale={width}:{height}")
+    return ",".join(steps)
+
+
+def profile_encoder_args(profile, threads=0):
+    bitrate = ['-b:v', profile["video_bitrate"]] if profile["video_bitrate"] else []
+    return encoder_args(threads) + bitrate
+
+
+def title_graph(title, source, output, label):
+    # A title filter is a plain filter chain, or a title image from
+    # titles.title_image that is overlaid from a second input
+    if isinstance(title, str):
+        return [f"[{source}]{title}[{output}]"]
+    return overlay_graph(title, source, output, label)
+
+
+def part_filter(profile, part):
+    chain = profile_chain(profile)
+    title = profile["title_filter"](part["title"])
+    if isinstance(title, str):
+        return f"{chain},{title}" if chain else title
+    # -vf takes a whole graph too, from [in] to [out]
+    if not chain:
+        return ";".join(title_graph(title, "in", "out", 0))
+    return ";".join([f"[in]{chain}[framed]"] + title_graph(title, "framed", "out", 0))
+
+
+def render_titles(parts, profiles):
+    # Title images are drawn once, before any ffmpeg reads them
+    titles = {}
+    for part in parts:
+        title = profiles[part.get("profile", 0)]["title_filter"](part["title"])
+        if not isinstance(title, str):
+            titles[title["image"]] = title
+    with ThreadPoolExecutor() as pool:
+        list(pool.map(render_title, titles.values()))
+
+
+def build_single_pass_command(file_path, parts, profiles, has_audio=True, threads=0):
+    # One decode feeds every part of every profile: crop and scale once per
+    # profile, split the frames, then trim and title each branch. The input
+    # is seeked to the first part so nothing before it is decoded. A part
+    # that spans removed ranges gets a branch per piece, joined with concat.
+    offset = min(part["start"] for part in parts)
+    span = max(part["end"] for part in parts) - offset
+    branches = [(i, j) for i, part in enumerate(parts) for j in range(len(part_pieces(part)))]
+    used = sorted({part.get("profile", 0) for part in parts})
+
+    # One extra untrimmed branch goes to a null output: every part restarts
+    # at 0, so this is the only output whose time shows how far into the
+    # source the pass is, which is what -progress reports. It is the first
+    # output, because -progress counts fps on the first video stream, and
+    # a part's encoder stops counting once the part is done.
+    graph = [f"[0:v]split={len(used) + 1}" + "".join(f"[src{k}]" for k in used) + "[clock]"]
+    for k in used:
+        members = [(i, j) for i, j in branches if parts[i].get("profile", 0) == k]
+        chain = profile_chain(profiles[k])
+        graph.append(f"[src{k}]{chain + ',' if chain else ''}split={len(members)}"
+                     + "".join(f"[v{i}_{j}]" for i, j in members))
+    if has_audio:
+        graph.append(f"[0:a]asplit={len(branches)}" + "".join(f"[a{i}_{j}]" for i, j in branches))
+
+    outputs = []
+    for i, part in enumerate(parts):
+        profile = profiles[part.get("profile", 0)]
+        title = profile['title_filter'](part['title'])
+        pieces = part_pieces(part)
+        video, audio = [], []
+        for j, (start, end) in enumerate(pieces):
+            start, end = start - offset, end - offset
+            video.append(f"[v{i}_{j}]trim=start={start}:end={end},setpts=PTS-STARTPTS")
+            audio.append(f"[a{i}_{j}]atrim=start={start}:end={end},asetpts=PTS-STARTPTS")
+        if len(pieces) == 1:
+            graph.append(f"{video[0]}[vt{i}]")
+            if has_audio:
+                graph.append(f"{audio[0]}[aout{i}]")
+        else:
+            inputs = ""
+            for j in range(len(pieces)):
+                graph.append(f"{video[j]}[vp{i}_{j}]")
+                inputs += f"[vp{i}_{j}]"
+                if has_audio:
+                    graph.append(f"{audio[j]}[ap{i}_{j}]")
+                    inputs += f"[ap{i}_{j}]"
+            graph.append(f"{inputs}concat=n={len(pieces)}:v=1:a={int(has_audio)}[vt{i}]"
+                         + (f"[aout{i}]" if has_audio else ""))
+        graph += title_graph(title, f"vt{i}", f"vout{i}", i)
+        outputs += ['-map', f"[vout{i}]"]
+        if has_audio:
+            outputs += ['-map', f"[aout{i}]"]
+        outputs += profile_encoder_args(profile, threads) + [part["output_path"]]
+
+    return (
+        ['ffmpeg', '-ss', str(offset), '-t', str(span), '-i', file_path,
+         '-filter_complex', ";".join(graph), '-map', '[clock]', '-f', 'null', '-']
+        + outputs
+    )
+
+
+def snap_to_keyframes(parts, keyframes):
+    # Copy mode can only cut on keyframes; the very start and end stay put
+    last_end = max(part["end"] for part in parts)
+    snapped = []
+    for part in parts:
+        pieces = []
+        for start, end in part_pieces(part):
+            start = start if start == 0 else nearest_keyframe(keyframes, start)
+            end = end if end == last_end else nearest_keyframe(keyframes, end)
+            if end > start:
+                pieces.append((start, end))
+        if pieces:
+            snapped.append(dict(part, start=pieces[0][0], end=pieces[-1][1], pieces=pieces))
+    return snapped
+
+
+def build_copy_command(file_path, output_path, start_time, end_time):
+    return [
+        'ffmpeg', '-ss', str(start_time), '-i', file_path, '-t', str(end_time - start_time),
+        '-map', '0:v:0', '-map', '0:a?', '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+        output_path
+    ]
+
+
+def smartcut_supported(info):
+    # Only an H.264 head can be joined to copied H.264 GOPs
+    return bool(info.get("video")) and info["video"]["codec"] == "h264"
+
+
+def smartcut_head_args(video):
+    # Encoder settings that make the re-encoded head match the copied GOPs
+    args = ['-c:v', 'libx264']
+    if video.get("profile") in X264_PROFILES:
+        args += ['-profile:v', X264_PROFILES[video["profile"]]]
+    if video.get("level") and video["level"] > 0:
+        args += ['-level:v', str(video["level"])]
+    if video.get("pix_fmt"):
+        args += ['-pix_fmt', video["pix_fmt"]]
+    return args
+
+
+def track_timescale(video):
+    # Writes the source's timescale, so the head, the tail and the joined
+    # part keep their timestamps on the same grid
+    timescale = (video.get("time_base") or "").partition("/")[2]
+    return ['-video_track_timescale', timescale] if timescale.isdigit() else []
+
+
+def build_smartcut_task(file_path, part, keyframes, threads=0, video=None):
+    # video is probe()["video"] of an H.264 source (see smartcut_supported)
+    start, end, output_path = part["start"], part["end"], part["output_path"]
+    video = video or {}
+    keyframe = next_keyframe(keyframes, start)
+    if keyframe is not None and keyframe - start < 0.001:
+        return {"cmds": [build_copy_command(file_path, output_path, start, end)], "parts": [part]}
+    if keyframe is None or keyframe >= end:
+        # No keyframe inside the part: it is all partial GOP
+        return {"cmds": [build_part_command(file_path, output_path, start, end, "null", "input", threads)],
+                "parts": [part]}
+
+    # Re-encode the video up to the first keyframe, copy it from there and
+    # join the two. Audio is encoded over the exact part range while joining:
+    # copied audio would start at the GOP's keyframe, not at the cut.
+    # The head and the copied GOPs have different SPS/PPS, but an mp4 has
+    # room for one set in its header. As Annex B each half carries its own in
+    # front of every keyframe, the mp4 muxer keeps them in the samples, and
+    # each half decodes with its own after the join.
+    in_band = ['-bsf:v', 'h264_mp4toannexb'] + track_timescale(video)
+    head, tail = output_path + ".head.mp4", output_path + ".tail.mp4"
+    concat_list = output_path + ".concat.txt"
+    return {
+        "cmds": [
+            ['ffmpeg', '-ss', str(start), '-i', file_path, '-t', str(keyframe - start),
+             '-map', '0:v:0'] + smartcut_head_args(video) + (['-threads', str(threads)] if threads else [])
+            + in_band + [head],
+            ['ffmpeg', '-ss', str(keyframe), '-i', file_path, '-t', str(end - keyframe),
+             '-map', '0:v:0', '-c', 'copy', '-avoid_negative_ts', 'make_zero'] + in_band + [tail],
+            ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', concat_list,
+             '-ss', str(start), '-t', str(end - start), '-i', file_path,
+             '-map', '0:v', '-map', '1:a?', '-c:v', 'copy', '-c:a', 'aac'] + track_timescale(video) + [output_path],
+        ],
+        "parts": [part],
+        "files": {concat_list: f"file '{os.path.abspath(head)}'\nfile '{os.path.abspath(tail)}'\n"},
+        "temp_files": [head, tail, concat_list],
+    }
+
+
+def join_pieces(part, build_piece):
+    # A part that spans removed ranges: build_piece(piece_part) writes each
+    # piece to a temporary file, and the pieces are joined without another
+    # encode. A part made of one piece is just build_piece(part).
+    pieces = part_pieces(part)
+    if len(pieces) == 1:
+        return build_piece(part)
+    output_path = part["output_path"]
+    concat_list = output_path + ".concat.txt"
+    task = {"cmds": [], "parts": [part], "files": {}, "temp_files": []}
+    paths = []
+    for j, (start, end) in enumerate(pieces):
+        path = f"{output_path}.piece{j}.mp4"
+        piece = build_piece(dict(part, start=start, end=end, pieces=[(start, end)], output_path=path))
+        task["cmds"] += piece["cmds"]
+        task["files"].update(piece.get("files", {}))
+        task["temp_files"] += piece.get("temp_files", []) + [path]
+        paths.append(path)
+    task["files"][concat_list] = "".join(f"file '{os.path.abspath(path)}'\n" for path in paths)
+    task["temp_files"].append(concat_list)
+    # Copied pieces can run a frame or two past their end; -t keeps the part
+    # at its planned length
+    length = sum(end - start for start, end in pieces)
+    task["cmds"].append(['ffmpeg', '-f', 'concat', '-safe', '0', '-i', concat_list,
+                         '-t', str(length), '-c', 'copy', output_path])
+    return task
+
+
+def contiguous_runs(parts):
+    # parts grouped into segments (a segment's parts in every profile), and
+    # the segments into runs that follow on from each other in the source.
+    # After reuse only the changed parts are left, and a pass over a run
+    # never decodes the stretches of source in between.
+    runs = []
+    for part in parts:
+        segment = runs[-1][-1] if runs else None
+        if segment and part["index"] == segment[0]["index"]:
+            segment.append(part)
+        elif segment and abs(part["start"] - segment[0]["end"]) < MIN_PIECE:
+            runs[-1].append([part])
+        else:
+            runs.append([[part]])
+    return runs
+
+
+def build_split_tasks(file_path, parts, profiles, mode=DEFAULT_SPLIT_MODE, has_audio=True, jobs=1, threads=0):
+    # Each task is one or more commands run in order, and the parts they write
+    if mode not in COPY_MODES:
+        render_titles(parts, profiles)
+    if mode == "single":
+        # Enough batches to keep every job busy, but never more than
+        # SINGLE_PASS_BATCH outputs in one process. Batches hold whole
+        # segments, so each stretch of source is decoded once for all
+        # profiles, and never span a gap between the parts to render.
+        batch = max(1, min(SINGLE_PASS_BATCH, math.ceil(len(parts) / jobs)))
+        segments_per_batch = math.ceil(batch / len(profiles))
+        tasks = []
+        for run in contiguous_runs(parts):
+            for i in range(0, len(run), segments_per_batch):
+                batch_parts = [part for segment in run[i:i + segments_per_batch] for part in segment]
+                tasks.append({"cmds": [build_single_pass_command(file_path, batch_parts, profiles, has_audio,
+                                                                 threads)],
+                              "parts": batch_parts})
+        return tasks
+    if mode in COPY_MODES:
+        if len(profiles) > 1 or profiles[0]["crop"] or profiles[0]["resolution"]:
+            raise ValueError(f"{mode} mode cannot crop, scale or render several profiles; "
+                             "use 16:9 or a re-encoding mode")
+        keyframes = load_keyframes(file_path)
+        if mode == "copy":
+            return [
+                join_pieces(part, lambda piece: {
+                    "cmds": [build_copy_command(file_path, piece["output_path"], piece["start"], piece["end"])],
+                    "parts": [piece]})
+                for part in snap_to_keyframes(parts, keyframes)
+            ]
+        video = probe(file_path)["video"]
+        return [join_pieces(part, lambda piece: build_smartcut_task(file_path, piece, keyframes, threads, video))
+                for part in parts]
+    tasks = []
+    for part in parts:
+        profile = profiles[part.get("profile", 0)]
+        if len(part_pieces(part)) > 1:
+            # A single -vf chain cannot join pieces: the part gets its own
+            # trim/concat graph, input-seeked to its first piece
+            cmd = build_single_pass_command(file_path, [part], profiles, has_audio, threads)
+            tasks.append({"cmds": [cmd], "parts": [part]})
+            continue
+        cmd = build_part_command(file_path, part["output_path"], part["start"], part["end"],
+                                 part_filter(profile, part), mode,
+                                 encoder=profile_encoder_args(profile, threads))
+        tasks.append({"cmds": [cmd], "parts": [part]})
+    return tasks
+
+
+def output_ok(path):
+    return os.path.isfile(path) and os.path.getsize(path) > 0
+
+
+class CancelToken:
+    # Shared by the worker threads of one job; cancel() stops the job and
+    # kills the ffmpeg processes that are running for it
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            for process in self._processes:
+                process.kill()
+
+    def register(self, process):
+        with self._lock:
+            self._processes.add(process)
+            if self._event.is_set():
+                process.kill()
+
+    def unregister(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+
+def task_span(task):
+    # Seconds of source the task's commands run through
+    return max(part["end"] for part in task["parts"]) - min(part["start"] for part in task["parts"])
+
+
+def progress_tracker(tasks, on_progress):
+    # Folds the -progress reports of every running ffmpeg into one report
+    # for the part being written and one for the whole job
+    lock = threading.Lock()
+    total = sum(task_span(task) for task in tasks) or 1
+    state = {id(task): {"done": 0.0, "bytes": 0, "fps": 0.0, "speed": 0.0} for task in tasks}
+    finished = {"parts": 0}
+    parts_total = sum(len(task["parts"]) for task in tasks)
+
+    def on_task_progress(task, stats):
+        offset = min(part["start"] for part in task["parts"])
+        out_time = stats["out_time"]
+        with lock:
+            current = state[id(task)]
+            current["done"] = min(task_span(task), max(current["done"], out_time))
+            # ffmpeg's total_size only covers the first output of a pass
+            current["bytes"] = sum(os.path.getsize(p["output_path"]) for p in task["parts"]
+                                   if os.path.exists(p["output_path"]))
+            running = stats["progress"] != "end"
+            current["fps"] = stats["fps"] if running else 0.0
+            current["speed"] = stats["speed"] if running else 0.0
+
+            part = next((p for p in task["parts"] if p["end"] - offset > out_time), task["parts"][-1])
+            part_length = part["end"] - part["start"]
+            part_done = min(part_length, max(0.0, out_time - (part["start"] - offset)))
+            job_done = sum(s["done"] for s in state.values())
+            job_speed = sum(s["speed"] for s in state.values())
+            report = {
+                "part": part,
+                "part_fraction": part_done / part_length if part_length else 1.0,
+                "part_eta": (part_length - part_done) / stats["speed"] if stats["speed"] else None,
+                "fps": stats["fps"],
+                "speed": stats["speed"],
+                "bytes": current["bytes"],
+                "job_fraction": job_done / total,
+                "job_eta": (total - job_done) / job_speed if job_speed else None,
+                "job_fps": sum(s["fps"] for s in state.values()),
+                "job_speed": job_speed,
+                "job_bytes": sum(s["bytes"] for s in state.values()),
+                "parts_done": finished["parts"],
+                "parts_total": parts_total,
+            }
+        on_progress(report)
+
+    def on_part_done(part):
+        with lock:
+            finished["parts"] += 1
+
+    return on_task_progress, on_part_done
+
+
+def run_task(task, on_progress=None, cancel=None):
+    if cancel and cancel.is_set():
+        return [(part, False) for part in task["parts"]]
+    ok = True
+    report = (lambda stats: on_progress(task, stats)) if on_progress else None
+    try:
+        for path, text in task.get("files", {}).items():
+            with open(path, "w") as f:
+                f.write(text)
+        outputs = [os.path.basename(part["output_path"]) for part in task["parts"]]
+        for cmd in task["cmds"]:
+            if run_command(cmd, report, cancel, task.get("stage"), outputs=outputs).returncode != 0:
+                ok = False
+                break
+    except OSError as e:
+        print(f"Failed to run ffmpeg: {e}")
+        ok = False
+    finally:
+        for path in task.get("temp_files", []):
+            if os.path.exists(path):
+                os.remove(path)
+        if cancel and cancel.is_set():
+            # The outputs of a killed ffmpeg are never finished files
+            for part in task["parts"]:
+                if os.path.exists(part["output_path"]):
+                    os.remove(part["output_path"])
+            ok = False
+    return [(part, ok and output_ok(part["output_path"])) for part in task["parts"]]
+
+
+def run_tasks(tasks, jobs=1, on_result=None, on_progress=None, cancel=None):
+    # A failed task only fails its own parts; the rest keep going.
+    # on_result(part, ok) is called as soon as each part is finished.
+    succeeded, failed = [], []
+    on_task_progress, on_part_done = progress_tracker(tasks, on_progress) if on_progress else (None, None)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = [pool.submit(run_task, task, on_task_progress, cancel) for task in tasks]
+        for future in as_completed(futures):
+            for part, ok in future.result():
+                (succeeded if ok else failed).append(part)
+                if on_part_done:
+                    on_part_done(part)
+                if on_result:
+                    on_result(part, ok)
+    succeeded.sort(key=lambda part: (part["index"], part.get("profile", 0)))
+    failed.sort(key=lambda part: (part["index"], part.get("profile", 0)))
+    print(f"Split finished: {len(succeeded)} part(s) succeeded, {len(failed)} failed")
+    for part in failed:
+        print("  failed:", part["output_path"])
+    return succeeded, failed
+
+
+def source_profiles(info, profiles):
+    # Every crop here cuts a portrait window out of a landscape frame; a
+    # source that is already portrait is used as it is
+    if is_portrait(info):
+        return [dict(profile, crop="") for profile in profiles]
+    return profiles
+
+
+def part_render_hash(file_path, part, profile, mode, has_audio):
+    # Everything that decides what a part looks like. Encoder threads are
+    # left out: they change how fast a part is written, not what it shows.
+    video_filter = part_filter(profile, part)
+    return render_hash({
+        "version": RENDER_VERSION,
+        "source": file_fingerprint(file_path),
+        "pieces": part_pieces(part),
+        "mode": mode,
+        "filter": video_filter,
+        "encoder": profile_encoder_args(profile),
+        "audio": has_audio,
+        "fonts": {font: file_fingerprint(font) for font in fonts_in(video_filter)},
+    })
+
+
+def find_unchanged(file_path, parts, profiles, mode=DEFAULT_SPLIT_MODE, has_audio=None, manifest=None):
+    # Parts whose output was rendered from exactly these inputs and is still there
+    info = probe(file_path)
+    has_audio = info["has_audio"] if has_audio is None else has_audio
+    profiles = source_profiles(info, profiles)
+    manifest = manifest or RenderManifest()
+    return [
+        part for part in parts
+        if output_ok(part["output_path"]) and manifest.matches(
+            part["output_path"],
+            part_render_hash(file_path, part, profiles[part.get("profile", 0)], mode, has_audio))
+    ]
+
+
+def split_profiles(file_path, parts, profiles, mode=DEFAULT_SPLIT_MODE, has_audio=None, jobs=None,
+                   threads=None, overwrite=False, reuse=True, on_result=None, on_progress=None, cancel=None):
+    # parts come from expand_profiles(); every profile is rendered from the
+    # same decode of the source in single-pass mode. With reuse, parts whose
+    # render inputs match the manifest in their output directory are not
+    # rendered again and count as succeeded. The whole call is logged as a
+    # "job" stage when the run log is on.
+    with run_log.Stage("job", source=file_path, mode=mode, parts=len(parts)) as job:
+        info = probe(file_path)
+        if has_audio is None:
+            has_audio = info["has_audio"]
+        if any(profile["crop"] for profile in profiles) and is_portrait(info):
+            print("Source is already portrait, skipping the crop")
+        if mode == "smartcut" and not smartcut_supported(info):
+            codec = info["video"]["codec"] if info.get("video") else "no video"
+            print(f"Smart cut needs an H.264 source, not {codec}; re-encoding the parts with input seeking")
+            mode = "input"
+            job.fields["mode"] = mode
+        profiles = source_profiles(info, profiles)
+
+        for output_dir in {os.path.dirname(os.path.abspath(part["output_path"])) for part in parts}:
+            os.makedirs(output_dir, exist_ok=True)
+        manifest = RenderManifest()
+        hashes = {part["output_path"]: part_render_hash(file_path, part, profiles[part.get("profile", 0)],
+                                                        mode, has_audio)
+                  for part in parts}
+        unchanged = []
+        if reuse:
+            unchanged = find_unchanged(file_path, parts, profiles, mode, has_audio, manifest)
+            if unchanged:
+                print(f"Reusing {len(unchanged)} unchanged part(s)")
+                for part in unchanged:
+                    if on_result:
+                        on_result(part, True)
+            reused = {part["output_path"] for part in unchanged}
+            parts = [part for part in parts if part["output_path"] not in reused]
+        job.fields.update(reused=len(unchanged), input_bytes=os.path.getsize(file_path))
+        if not parts:
+            job.fields.update(ok=True, rendered=0, failed=0, media_seconds=0.0, output_bytes=0)
+            return unchanged, []
+        manifest.forget(part["output_path"] for part in parts)
+
+        def record(part, ok):
+            if ok:
+                manifest.record(part["output_path"], hashes[part["output_path"]])
+            if on_result:
+                on_result(part, ok)
+
+        jobs = default_jobs() if jobs is None else jobs
+        threads = default_threads(jobs) if threads is None else threads
+        tasks = build_split_tasks(file_path, parts, profiles, mode, has_audio, jobs, threads)
+        for task in tasks:
+            task["stage"] = job
+        if overwrite:
+            # Replace existing outputs instead of asking on stdin
+            for task in tasks:
+                task["cmds"] = [cmd[:1] + ['-y'] + cmd[1:] for cmd in task["cmds"]]
+        succeeded, failed = run_tasks(tasks, jobs, record, on_progress, cancel)
+        job.fields.update(
+            ok=not failed, rendered=len(succeeded), failed=len(failed), jobs=jobs, threads=threads,
+            media_seconds=round(sum(end - start for part in succeeded for start, end in part_pieces(part)), 3),
+            output_bytes=sum(os.path.getsize(part["output_path"]) for part in succeeded),
+        )
+        succeeded = sorted(unchanged + succeeded, key=lambda part: (part["index"], part.get("profile", 0)))
+        return succeeded, failed
+
+
+def split_parts(file_path, parts, crop_filter, title_filter, mode=DEFAULT_SPLIT_MODE, **options):
+    # A job with a single output profile
+    return split_profiles(file_path, parts, [make_profile(title_filter, crop_filter)], mode, **options)
+
+
+def parse_progress(block):
+    # One "-progress" report: key=value lines ending with progress=continue|end
+    def number(key):
+        try:
+            return float(block.get(key, "").rstrip("x"))
+        except ValueError:
+            return 0.0
+    return {
+        "out_time": number("out_time_us") / 1000000,
+        "fps": number("fps"),
+        "speed": number("speed"),
+        "progress": block.get("progress", "continue"),
+    }
+
+
+def run_command(cmd, on_progress=None, cancel=None, stage=None, **log_fields):
+    # stage is the run_log.Stage of the job the command belongs to; with
+    # the run log on, the command is logged as an "ffmpeg" stage of it
+    print("Running command:", " ".join(cmd))
+    logging = run_log.enabled()
+    if on_progress is None and cancel is None and not logging:
+        return subprocess.run(cmd)
+
+    started = time.perf_counter()
+    cmd = cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+    if cancel:
+        cancel.register(process)
+    stats = None
+    try:
+        block = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            block[key] = value
+            if key == "progress":
+                stats = parse_progress(block)
+                if on_progress:
+                    on_progress(stats)
+                block = {}
+        usage = run_log.wait_child(process) if logging else process.wait()
+    finally:
+        if cancel:
+            cancel.unregister(process)
+    if logging:
+        if stage:
+            stage.add_child(usage)
+            log_fields["job"] = stage.id
+        # The last report covers the whole run: average fps and speed
+        run_log.record("ffmpeg", ok=process.returncode == 0, returncode=process.returncode,
+                       wall=round(time.perf_counter() - started, 3),
+                       media_seconds=stats["out_time"] if stats else None,
+                       fps=stats["fps"] if stats else None, speed=stats["speed"] if stats else None,
+                       **usage, **log_fields)
+    return subprocess.CompletedProcess(cmd, process.returncode)
@@ -0,0 +1,129 @@
+import base64
+import queue
+import threading
+import tkinter as tk
+from tkinter import messagebox
+
+from media_probe import probe
+from proxy import PROXY_HEIGHT, STRIP_WIDTH, crop_outline, make_proxy, preview_frame
+from split_progress import POLL_MS
+
+# Wait this long after the last slider move before grabbing a frame
+SCRUB_MS = 80
+
+
+def format_time(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def preview_source(root, file_path, aspect_ratio="16:9", crop_offset=0):
+    # Modal window to check the crop and find cut points on a low-resolution
+    # proxy of the source, made once and cached. Returns None if closed, or
+    # {"crop_offset", "cut_start", "cut_end"} with the cut times the user
+    # marked (None when not marked). Parts are still rendered from the original.
+    info = probe(file_path)
+    duration = info["duration"]
+    # crop offsets are in source pixels; the proxy is PROXY_HEIGHT tall
+    scale = PROXY_HEIGHT / info["video"]["height"] if info.get("video") else 1.0
+    result = {"crop_offset": crop_offset, "cut_start": None, "cut_end": None}
+    closed = {"done": False}
+
+    window = tk.Toplevel(root)
+    window.title("Preview")
+    window.transient(root)
+    window.grab_set()
+    status = tk.StringVar(value="Preparing preview...")
+    tk.Label(window, textvariable=status, anchor="w").pack(fill="x", padx=10, pady=(10, 5))
+
+    updates = queue.Queue()
+
+    def work():
+        try:
+            updates.put(("done", make_proxy(file_path)))
+        except Exception as e:
+            updates.put(("error", e))
+
+    def poll():
+        if not window.winfo_exists():
+            return
+        try:
+            kind, value = updates.get_nowait()
+        except queue.Empty:
+            window.after(POLL_MS, poll)
+            return
+        if kind == "error":
+            window.grab_release()
+            window.destroy()
+            messagebox.showerror("Error", f"Failed to prepare the preview:\n{str(value)}")
+            return
+        build(*value)
+
+    def build(proxy_path, strip_path):
+        images = {"strip": tk.PhotoImage(file=strip_path)}
+        strip = tk.Label(window, image=images["strip"], cursor="hand2")
+        strip.pack(padx=10)
+        frame = tk.Label(window)
+        frame.pack(padx=10, pady=5)
+
+        position = tk.DoubleVar(value=0.0)
+        offset = tk.IntVar(value=crop_offset)
+        pending = {"id": None}
+        video = info.get("video") or {"width": 0, "height": 0}
+        # Past this the crop window is pinned to the edge of the frame;
+        # sources that are already portrait are not cropped at all
+        reach = int((video["width"] - video["height"] * 9 / 16) / 2)
+        outline = aspect_ratio == "9:16" and reach > 0
+
+        def refresh():
+            pending["id"] = None
+            png = preview_frame(proxy_path, position.get(),
+                                crop_outline(aspect_ratio, offset.get(), scale) if outline else "")
+            if png:
+                images["frame"] = tk.PhotoImage(data=base64.b64encode(png))
+                frame.config(image=images["frame"])
+            marks = [f"{name} {format_time(result[key])}" for name, key in
+                     (("cut start", "cut_start"), ("cut end", "cut_end")) if result[key] is not None]
+            status.set(f"{format_time(position.get())} / {format_time(duration)}"
+                       + (f"  ·  {', '.join(marks)}" if marks else ""))
+
+        def schedule(*_):
+            if pending["id"]:
+                window.after_cancel(pending["id"])
+            pending["id"] = window.after(SCRUB_MS, refresh)
+
+        def on_strip_click(event):
+            # The strip covers the whole source from left to right
+            position.set(round(duration * event.x / images["strip"].width(), 1))
+            schedule()
+
+        strip.bind("<Button-1>", on_strip_click)
+        tk.Scale(window, variable=position, from_=0, to=duration, resolution=0.1, orient="horizontal",
+                 showvalue=False, length=STRIP_WIDTH, command=schedule).pack(padx=10)
+        if outline:
+            tk.Label(window, text="Crop offset (pixels right of center):").pack()
+            tk.Scale(window, variable=offset, from_=-reach, to=reach, orient="horizontal",
+                     length=300, command=schedule).pack()
+
+        def mark(key):
+            result[key] = round(position.get())
+            refresh()
+
+        def finish():
+            result["crop_offset"] = offset.get()
+            closed["done"] = True
+            window.grab_release()
+            window.destroy()
+
+        buttons = tk.Frame(window)
+        buttons.pack(pady=10)
+        tk.Button(buttons, text="Mark Cut Start", command=lambda: mark("cut_start")).pack(side="left", padx=5)
+        tk.Button(buttons, text="Mark Cut End", command=lambda: mark("cut_end")).pack(side="left", padx=5)
+        tk.Button(buttons, text="Done", command=finish).pack(side="left", padx=5)
+        refresh()
+
+    threading.Thread(target=work, daemon=True).start()
+    window.after(POLL_MS, poll)
+    root.wait_window(window)
+    return result if closed["done"] else None
@@ -0,0 +1,110 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import messagebox
+
+from split_engine import DEFAULT_SPLIT_MODE, CancelToken, find_unchanged, split_profiles
+
+POLL_MS = 200
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def format_bytes(size):
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KB", "MB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GB"
+
+
+def start_split(root, file_path, parts, profiles, on_done, **split_options):
+    # Runs split_profiles on a worker thread and shows its progress in a small
+    # window with a Cancel button; on_done(succeeded, failed) runs on the Tk
+    # thread once the job has finished and was not cancelled.
+    # Parts rendered earlier from the same inputs are reused, not overwritten
+    unchanged = {part["output_path"] for part in find_unchanged(
+        file_path, parts, profiles, split_options.get("mode", DEFAULT_SPLIT_MODE))}
+    existing = [part["output_path"] for part in parts
+                if os.path.exists(part["output_path"]) and part["output_path"] not in unchanged]
+    if existing:
+        if not messagebox.askyesno("Parts Exist", f"{len(existing)} part(s) already exist. Overwrite them?",
+                                   parent=root):
+            return
+        split_options["overwrite"] = True
+
+    window = tk.Toplevel(root)
+    window.title("Splitting...")
+    window.geometry("420x180")
+    window.transient(root)
+    window.grab_set()
+
+    part_text = tk.StringVar(value="Starting ffmpeg...")
+    job_text = tk.StringVar(value=f"Job: 0/{len(parts)} parts")
+    for text, pady in ((part_text, (15, 5)), (job_text, 5)):
+        tk.Label(window, textvariable=text, anchor="w", justify="left", wraplength=400).pack(fill="x", padx=10, pady=pady)
+
+    cancel = CancelToken()
+    updates = queue.Queue()
+
+    def on_cancel():
+        cancel_button.config(state="disabled", text="Cancelling...")
+        cancel.cancel()
+
+    cancel_button = tk.Button(window, text="Cancel", command=on_cancel, padx=10, pady=5)
+    cancel_button.pack(pady=10)
+    window.protocol("WM_DELETE_WINDOW", on_cancel)
+
+    def work():
+        try:
+            result = split_profiles(file_path, parts, profiles,
+                                    on_progress=lambda report: updates.put(("progress", report)),
+                                    cancel=cancel, **split_options)
+            updates.put(("done", result))
+        except Exception as e:
+            updates.put(("error", e))
+
+    def poll():
+        report = None
+        while True:
+            try:
+                kind, value = updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                report = value
+                continue
+            window.grab_release()
+            window.destroy()
+            if kind == "error":
+                messagebox.showerror("Error", f"Failed to split video:\n{str(value)}")
+            elif cancel.is_set():
+                messagebox.showinfo("Cancelled", "Splitting was cancelled and the unfinished parts were removed.")
+            else:
+                on_done(*value)
+            return
+
+        if report:
+            part = report["part"]
+            part_text.set(
+                f"{part['title']}: {report['part_fraction']:.0%}  ·  {report['fps']:.0f} fps  ·  "
+                f"{report['speed']:.2f}x  ·  ETA {format_eta(report['part_eta'])}  ·  {format_bytes(report['bytes'])}"
+            )
+            job_text.set(
+                f"Job: {report['parts_done']}/{report['parts_total']} parts  ·  {report['job_fraction']:.0%}  ·  "
+                f"{report['job_fps']:.0f} fps  ·  {report['job_speed']:.2f}x  ·  "
+                f"ETA {format_eta(report['job_eta'])}  ·  {format_bytes(report['job_bytes'])}"
+            )
+        window.after(POLL_MS, poll)
+
+    threading.Thread(target=work, daemon=True).start()
+    window.after(POLL_MS, poll)
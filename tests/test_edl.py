@@ -0,0 +1,79 @@
+import pytest
+
+from edl import edited_duration, kept_ranges, load_edl, merge_ranges, parse_time, source_pieces
+from split_engine import plan_parts
+
+
+def part_length(part):
+    return sum(end - start for start, end in part["pieces"])
+
+
+def test_parse_time():
+    assert parse_time("01:02:03") == 3723
+    assert parse_time("12:30") == 750
+    assert parse_time("4.5") == 4.5
+
+
+def test_overlapping_cuts_are_joined():
+    assert merge_ranges([(30, 40), (10, 20), (15, 35)], 100) == [(10, 40)]
+    assert merge_ranges([(10, 20), (20, 30)], 100) == [(10, 30)]
+
+
+def test_cuts_outside_the_source_are_clipped_or_dropped():
+    assert merge_ranges([(-5, 10), (90, 120), (150, 160)], 100) == [(0.0, 10), (90, 100)]
+
+
+def test_cut_that_ends_before_it_starts_is_rejected():
+    with pytest.raises(ValueError):
+        merge_ranges([(20, 10)], 100)
+
+
+def test_kept_ranges():
+    assert kept_ranges(100, []) == [(0.0, 100)]
+    assert kept_ranges(100, [(0, 10), (50, 60)]) == [(10, 50), (60, 100)]
+    assert kept_ranges(100, [(0, 100)]) == []
+    assert edited_duration(kept_ranges(100, [(0, 10), (50, 60)])) == 80
+
+
+def test_source_pieces_span_a_removed_range():
+    kept = [(0.0, 10.0), (20.0, 30.0)]
+    assert source_pieces(kept, 5, 15) == [(5.0, 10.0), (20.0, 25.0)]
+    assert source_pieces(kept, 10, 20) == [(20.0, 30.0)]
+
+
+def test_every_part_but_the_last_is_exactly_segment_length():
+    parts = plan_parts("/videos/talk.mp4", 100, 20, "Talk", removed=[(10, 15), (42, 44.5)])
+    assert [part_length(part) for part in parts] == pytest.approx([20, 20, 20, 20, 12.5])
+    assert [part["index"] for part in parts] == [1, 2, 3, 4, 5]
+    assert parts[0]["output_path"] == "/videos/talk_Part_One.mp4"
+
+
+def test_cut_inside_a_part_is_left_out_of_it():
+    parts = plan_parts("/videos/talk.mp4", 60, 20, "Talk", removed=[(5, 8)])
+    assert parts[0]["pieces"] == [(0.0, 5), (8, 23)]
+    assert (parts[0]["start"], parts[0]["end"]) == (0.0, 23)
+    assert parts[1]["pieces"] == [(23, 43)]
+
+
+def test_gui_cut_counts_like_a_removed_range():
+    assert plan_parts("/videos/talk.mp4", 60, 20, "Talk", cut_start=5, cut_end=8) == \
+        plan_parts("/videos/talk.mp4", 60, 20, "Talk", removed=[(5, 8)])
+
+
+def test_cuts_that_remove_everything_are_rejected():
+    with pytest.raises(ValueError):
+        plan_parts("/videos/talk.mp4", 60, 20, "Talk", removed=[(0, 30), (25, 60)])
+
+
+def test_load_edl(tmp_path):
+    path = tmp_path / "cuts.edl"
+    path.write_text("# intro\n00:00:00 00:00:04\n\n12:30,13:05  # sponsor\n  90 95.5\n")
+    assert load_edl(path) == [(0.0, 4.0), (750.0, 785.0), (90.0, 95.5)]
+
+
+@pytest.mark.parametrize("line", ["10", "10 20 30", "ten 20"])
+def test_load_edl_reports_the_bad_line(tmp_path, line):
+    path = tmp_path / "cuts.edl"
+    path.write_text(f"0 4\n{line}\n")
+    with pytest.raises(ValueError, match=r"cuts\.edl:2"):
+        load_edl(path)
@@ -0,0 +1,73 @@
+import pytest
+
+from scenes import cut_candidates, snap_boundaries
+from split_engine import MAX_SEGMENT_LENGTH, MIN_SEGMENT_LENGTH, plan_parts
+
+
+def scene_changes(*times):
+    return [(time, time, "scene change") for time in times]
+
+
+def lengths(cuts, length):
+    starts = [time for time, _, _ in cuts]
+    return [end - start for start, end in zip(starts, starts[1:] + [length])]
+
+
+def snap(length, segment_length, candidates, tolerance):
+    return snap_boundaries(length, segment_length, candidates, tolerance, MIN_SEGMENT_LENGTH, MAX_SEGMENT_LENGTH)
+
+
+def test_cuts_stay_on_the_grid_without_candidates():
+    cuts = snap(65, 10, [], 3)
+    assert [time for time, _, _ in cuts] == [0, 10, 20, 30, 40, 50, 60]
+    assert all(kind is None for _, _, kind in cuts)
+
+
+def test_cut_moves_to_the_nearest_candidate_within_tolerance():
+    cuts = snap(100, 30, scene_changes(27.5, 31, 58, 95), 3)
+    assert cuts[1] == (31, 1, "scene change")
+    assert cuts[2] == (58, -2, "scene change")
+    # 95 is too far from 90 and would shrink the last part
+    assert cuts[3] == (90, 0, None)
+
+
+def test_cut_inside_a_silence_stays_on_the_grid():
+    cuts = snap(45, 20, [(18.5, 21.0, "silence")], 3)
+    assert cuts[1] == (20, 0, "silence")
+
+
+def test_later_cuts_do_not_drift_when_parts_are_at_the_minimum_length():
+    # Every candidate is 2s after the grid. Taking them would push each cut
+    # after the first later and leave a 3s last part.
+    cuts = snap(65, 10, scene_changes(12, 22, 32, 42, 52, 62), 3)
+    assert lengths(cuts, 65)[-1] == 5
+    assert all(length >= MIN_SEGMENT_LENGTH for length in lengths(cuts, 65)[:-1])
+
+
+def test_parts_keep_their_length_limits():
+    candidates = scene_changes(*range(1, 300, 7))
+    for segment_length, tolerance in ((10, 4), (30, 10), (60, 25)):
+        for length in (95, 181.5, 299):
+            cuts = snap(length, segment_length, candidates, tolerance)
+            parts = lengths(cuts, length)
+            grid_last = length % segment_length or segment_length
+            assert all(MIN_SEGMENT_LENGTH <= part <= MAX_SEGMENT_LENGTH for part in parts[:-1])
+            assert parts[-1] >= min(grid_last, MIN_SEGMENT_LENGTH) - 1e-9
+            assert all(abs(shift) <= tolerance for _, shift, _ in cuts)
+
+
+def test_candidates_move_onto_the_edited_timeline():
+    index = {"scenes": [[5.0, 20.0], [15.0, 30.0], [25.0, 12.0]], "silences": [[8.0, 12.0]]}
+    # 10-20 is cut out: the scene change at 15 goes, the one at 25 moves to 15
+    kept = [(0.0, 10.0), (20.0, 30.0)]
+    assert cut_candidates(index, kept) == [
+        (5.0, 5.0, "scene change"),
+        (8.15, 10.0, "silence"),
+        (15.0, 15.0, "scene change"),
+    ]
+
+
+def test_negative_tolerance_is_rejected():
+    index = {"scenes": [[31.0, 20.0]], "silences": []}
+    with pytest.raises(ValueError):
+        plan_parts("/videos/talk.mp4", 100, 30, "Talk", scene_index=index, tolerance=-5)
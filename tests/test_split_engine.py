@@ -0,0 +1,28 @@
+from split_engine import build_split_tasks, contiguous_runs, expand_profiles, make_profile, plan_parts
+
+PROFILES = [make_profile(lambda title: "null", name="wide"), make_profile(lambda title: "null", name="tall")]
+
+
+def hour_of_parts():
+    return expand_profiles(plan_parts("/videos/talk.mp4", 3600, 60, "Talk"), PROFILES)
+
+
+def test_far_apart_parts_are_separate_runs():
+    parts = [part for part in hour_of_parts() if part["index"] in (1, 60)]
+    runs = contiguous_runs(parts)
+    assert [[[part["index"] for part in segment] for segment in run] for run in runs] == [[[1, 1]], [[60, 60]]]
+
+
+def test_neighbouring_parts_share_a_run():
+    parts = [part for part in hour_of_parts() if part["index"] in (3, 4, 5, 40)]
+    runs = contiguous_runs(parts)
+    assert [[segment[0]["index"] for segment in run] for run in runs] == [[3, 4, 5], [40]]
+
+
+def test_single_pass_batches_only_decode_the_changed_parts():
+    parts = [part for part in hour_of_parts() if part["index"] in (1, 60)]
+    tasks = build_split_tasks("/videos/talk.mp4", parts, PROFILES, "single", has_audio=True, jobs=1)
+    spans = [(cmd[cmd.index('-ss') + 1], cmd[cmd.index('-t') + 1]) for task in tasks for cmd in task["cmds"]]
+    assert spans == [("0.0", "60.0"), ("3540.0", "60.0")]
+    # Both profiles of a segment come from the same decode
+    assert [len(task["parts"]) for task in tasks] == [2, 2]
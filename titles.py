@@ -0,0 +1,76 @@
+import os
+import threading
+
+import run_log
+from media_probe import CACHE_DIR
+from render_cache import file_fingerprint, render_hash
+
+TITLE_DIR = os.path.join(CACHE_DIR, "titles")
+# The text is centred on a canvas this wide and the canvas is centred on the
+# frame, so one image fits every frame up to 4K wide whatever the crop and
+# scale in front of it
+CANVAS_WIDTH = 3840
+
+
+def quote(value):
+    # Single-quoted filter option value; a quote inside is closed, escaped
+    # and reopened
+    return "'" + str(value).replace("'", r"'\''") + "'"
+
+
+def title_image(text, font_path, box_y, box_height, text_y, fontsize, fontcolor="white", box_color="black@0.5"):
+    # A title whose text is drawn once into a transparent PNG and overlaid,
+    # instead of being shaped and rasterized by drawtext on every frame. The
+    # box behind it stays a drawbox, which only fills a rectangle.
+    layout = {"box_y": box_y, "box_height": box_height, "text_y": str(text_y),
+              "fontsize": fontsize, "fontcolor": fontcolor}
+    key = render_hash({"text": text, "font": os.path.abspath(font_path),
+                       "font_file": file_fingerprint(font_path), "layout": layout})
+    return {
+        "text": text,
+        "font": font_path,
+        "layout": layout,
+        "image": os.path.join(TITLE_DIR, f"{key[:32]}.png"),
+        "box": f"drawbox=x=0:y={box_y}:w=iw:h={box_height}:color={box_color}:t=fill",
+    }
+
+
+def render_title(title):
+    # Cached by text, font and layout, so reruns and the other output
+    # profiles of a job reuse the image
+    if os.path.exists(title["image"]):
+        return title["image"]
+    os.makedirs(TITLE_DIR, exist_ok=True)
+    layout = title["layout"]
+    base = f"{title['image'][:-4]}.{os.getpid()}.{threading.get_ident()}"
+    # The text goes through a file, so quotes, colons and % in titles need no escaping
+    text_path, tmp_path = base + ".txt", base + ".png"
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write(title["text"])
+    cmd = [
+        'ffmpeg', '-y', '-loglevel', 'error', '-f', 'lavfi',
+        '-i', f"color=c=black@0:s={CANVAS_WIDTH}x{layout['box_y'] + layout['box_height']},format=rgba",
+        '-vf', f"drawtext=fontfile={quote(title['font'])}:textfile={quote(text_path)}:expansion=none:"
+               f"x=(w-text_w)/2:y={layout['text_y']}:fontcolor={layout['fontcolor']}:fontsize={layout['fontsize']}",
+        '-frames:v', '1', tmp_path
+    ]
+    try:
+        result = run_log.run("title", cmd, text=title["text"])
+        if result.returncode != 0:
+            raise ValueError(f"Could not render the title {title['text']!r}: {result.stderr.decode().strip()}")
+        os.replace(tmp_path, title["image"])
+    finally:
+        for path in (text_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return title["image"]
+
+
+def overlay_graph(title, source, output, label):
+    # Graph statements that draw a title image over [source] into [output]
+    statements = [f"movie={quote(title['image'])}[title{label}]"]
+    if title["box"]:
+        statements.append(f"[{source}]{title['box']}[boxed{label}]")
+        source = f"boxed{label}"
+    statements.append(f"[{source}][title{label}]overlay=x=(W-w)/2:y=0[{output}]")
+    return statements
@@ -2,8 +2,11 @@ import os
 os.environ['TK_SILENCE_DEPRECATION'] = '1'
 import tkinter as tk
 from tkinter import filedialog, messagebox, simpledialog
-import subprocess
-import re
+from media_probe import get_duration
+from split_engine import ASPECT_NAMES, crop_filter_for, expand_profiles, make_profile, plan_parts
+from split_preview import format_time, preview_source
+from split_progress import start_split
+from titles import title_image
 
 def split_video():
     file_path = filedialog.askopenfilename(
@@ -26,23 +29,34 @@ def split_video():
                                             parent=root) or "Video"
 
         aspect_ratio = simpledialog.askstring("Aspect Ratio",
-                                              "Enter aspect ratio (9:16 for Portrait, 16:9 for Landscape):",
+                                              "Enter aspect ratio (9:16 for Portrait, 16:9 for Landscape, 9:16,16:9 for both):",
                                               parent=root)
-        if aspect_ratio not in ["9:16", "16:9"]:
-            messagebox.showerror("Invalid Input", "Invalid aspect ratio. Please enter 9:16 or 16:9.")
+        # Several ratios are all rendered from the same decode of the video
+        aspect_ratios = list(dict.fromkeys(a.strip() for a in (aspect_ratio or "").split(",")))
+        if any(a not in ["9:16", "16:9"] for a in aspect_ratios):
+            messagebox.showerror("Invalid Input", "Invalid aspect ratio. Please enter 9:16, 16:9 or 9:16,16:9.")
             return
 
+        # Optional: check the crop window and find cut points on a small proxy
+        crop_offset = 0
+        marks = {"cut_start": None, "cut_end": None}
+        if messagebox.askyesno("Preview", "Do you want to preview the crop and find the cut points first?"):
+            preview = preview_source(root, file_path, "9:16" if "9:16" in aspect_ratios else "16:9")
+            if preview:
+                crop_offset = preview["crop_offset"]
+                marks = preview
+
         # Optional: prompt for a section to cut out
         cut_out = messagebox.askyesno("Cut Out Section", "Do you want to cut out some seconds or minutes from your video?")
         cut_start, cut_end = None, None
         if cut_out:
             cut_start_str = simpledialog.askstring("Cut Start",
                                                     "Enter start time of the part to cut (HH:MM:SS):",
-                                                    initialvalue="00:00:00", parent=root)
+                                                    initialvalue=format_time(marks["cut_start"] or 0), parent=root)
             cut_start = convert_to_seconds(cut_start_str)
             cut_end_str = simpledialog.askstring("Cut End",
                                                   "Enter end time of the part to cut (HH:MM:SS):",
-                                                  initialvalue="00:00:04", parent=root)
+                                                  initialvalue=format_time(marks["cut_end"] or 4), parent=root)
             cut_end = convert_to_seconds(cut_end_str)
 
         duration = get_video_duration(file_path)
@@ -50,68 +64,30 @@ def split_video():
             messagebox.showerror("Error", "Could not determine video duration.")
             return
 
-        output_dir = os.path.dirname(file_path)
-        base_filename = os.path.splitext(os.path.basename(file_path))[0]
-        num_segments = int(duration // segment_length) + (1 if duration % segment_length > 0 else 0)
-
-        for i in range(num_segments):
-            start_time = i * segment_length
-            end_time = min(start_time + segment_length, duration)
-
-            # Adjust start and end if cutting out a section
-            if cut_start is not None and cut_end is not None:
-                if cut_start <= start_time < cut_end:
-                    start_time = cut_end
-                if cut_start < end_time <= cut_end:
-                    end_time = cut_start
-            if end_time - start_time <= 0:
-                continue
-
-            part_label = f"Part {number_to_words(i+1)}"
-            full_title = f"{title_base} - {part_label}"
-            output_path = os.path.join(output_dir, f"{base_filename}_{part_label.replace(' ', '_')}.mp4")
-
-            # Build filter chain: if 9:16, apply a crop filter and then a title overlay.
-            font_path = "/usr/share/fonts/truetype/noto/NotoSansMyanmar-Regular.ttf"  # adjust as needed
-            if aspect_ratio == "9:16":
-                # Crop: from a landscape source, crop a portrait region centered horizontally.
-                crop_filter = "crop=ih*9/16:ih:(iw-ih*9/16)/2:0"
-                # Overlay: add a title box at the top; adjust y-position if needed.
-                title_filter = (
-                    "drawbox=x=0:y=0:w=iw:h=50:color=black@0.5:t=fill,"
-                    f"drawtext=fontfile={font_path}:text='{full_title}':"
-                    "x=(w-text_w)/2:y=(50-text_h)/2:fontcolor=white:fontsize=24"
-                )
-                full_filter = f"{crop_filter},{title_filter}"
-            else:
-                # For 16:9, no crop is applied.
-                title_filter = (
-                    "drawbox=x=0:y=20:w=iw:h=100:color=black@0.5:t=fill,"
-                    f"drawtext=fontfile={font_path}:text='{full_title}':"
-                    "x=(w-text_w)/2:y=50:fontcolor=white:fontsize=30"
-                )
-                full_filter = title_filter
-
-            cmd = [
-                'ffmpeg', '-i', file_path,
-                '-vf', full_filter,
-                '-ss', str(start_time), '-to', str(end_time),
-                '-c:v', 'libx264', '-c:a', 'aac', '-strict', 'experimental',
-                output_path
-            ]
-            print("Running command:", " ".join(cmd))
-            subprocess.run(cmd)
-
-        messagebox.showinfo("Success", "Yay! Your video is ready, sweetheart! Now go show it off!")
+        parts = plan_parts(file_path, duration, segment_length, title_base, cut_start, cut_end,
+                           part_name=number_to_words)
+
+        # One output profile per ratio: if 9:16, crop a portrait region centered
+        # horizontally (or moved by the offset picked in the preview); every
+        # part then gets its own title overlay.
+        profiles = [make_profile(lambda title, a=a: create_title_filter(title, a),
+                                 crop_filter_for(a, crop_offset), name=ASPECT_NAMES[a])
+                    for a in aspect_ratios]
+
+        def on_done(succeeded, failed):
+            if failed:
+                messagebox.showwarning("Partly Done", f"{len(succeeded)} part(s) were written, {len(failed)} failed.\n"
+                                       "See the terminal output for the failed parts.")
+                return
+            messagebox.showinfo("Success", "Yay! Your video is ready, sweetheart! Now go show it off!")
+
+        # Encoding runs in the background so the window stays responsive
+        start_split(root, file_path, expand_profiles(parts, profiles), profiles, on_done)
     except Exception as e:
         messagebox.showerror("Error", f"Failed to split video:\n{str(e)}")
 
 def get_video_duration(file_path):
-    result = subprocess.run(['ffmpeg', '-i', file_path],
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    output = result.stderr.decode()
-    match = re.search(r"Duration:\s*(\d+):(\d+):(\d+\.\d+)", output)
-    return sum(float(x) * 60 ** i for i, x in enumerate(reversed(match.groups()))) if match else 0
+    return get_duration(file_path)
 
 def number_to_words(n):
     words = {
@@ -126,6 +102,14 @@ def convert_to_seconds(time_str):
     h, m, s = map(int, time_str.split(":"))
     return h * 3600 + m * 60 + s
 
+def create_title_filter(title_text, aspect_ratio):
+    font_path = "/usr/share/fonts/truetype/noto/NotoSansMyanmar-Regular.ttf"  # adjust as needed
+    if aspect_ratio == "9:16":
+        # Overlay: add a title box at the top; adjust y-position if needed.
+        return title_image(title_text, font_path, box_y=0, box_height=50, text_y="(50-text_h)/2", fontsize=24)
+    else:
+        return title_image(title_text, font_path, box_y=20, box_height=100, text_y=50, fontsize=30)
+
 root = tk.Tk()
 root.title("Fire Your Video Editor || Isaac Talb")
 root.geometry("300x200")